@@ -6,4 +6,10 @@ IAL expertise package: expertise outputs of IAL tasks.
 
 __version__ = "1.3.2"
 
-from . import experts, task
+
+def __getattr__(name):
+    """Import subpackages on first access, to keep the package import light."""
+    if name in ('experts', 'task'):
+        import importlib
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run the expertise of a whole campaign of tasks, out of their jobs.
+
+Each task working directory contains a JSON configuration of its expertise::
+
+    {"experts": [{"kind": "norms"}, {"kind": "fields_in_file", "expert": "fields_in_file"}],
+     "lead_expert": "norms",
+     "consistency": [{"kind": "plisting", "path": "ref.NODE.001_01", "task": "forecast"}],
+     "continuity": [{"kind": "taskinfo", "path": "continuity.task_summary.json", "task": "forecast"}]}
+
+where references paths are relative to the task working directory.
+A board "time_budget" (s) may also be specified.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+#: Default name of the expertise configuration file of a task
+CONFIG_NAME = 'expertise_config.json'
+
+
+class _LocalResource(object):
+    """Resource description of a local reference (cf. Vortex resource handler's *resource*)."""
+
+    def __init__(self, kind):
+        self.kind = kind
+
+
+class _LocalContainer(object):
+    """Container of a local reference (cf. Vortex resource handler's *container*)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def localpath(self):
+        return self.path
+
+
+class LocalResourceHandler(object):
+    """A local reference file, mimicking the interface of a Vortex resource handler used by experts."""
+
+    def __init__(self, kind, path):
+        self.resource = _LocalResource(kind)
+        self.container = _LocalContainer(path)
+
+
+def find_tasks(root, config_name=CONFIG_NAME):
+    """Find task working directories under **root**, i.e. containing a **config_name** file."""
+    tasks = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if config_name in filenames:
+            tasks.append(os.path.abspath(dirpath))
+            dirnames[:] = []  # a task working directory does not contain other tasks
+        dirnames.sort()
+    return sorted(tasks)
+
+
+def load_config(taskdir, config_name=CONFIG_NAME):
+    """Load the expertise configuration of a task."""
+    with open(os.path.join(taskdir, config_name), 'r') as f:
+        return json.load(f)
+
+
+def is_heavy(config):
+    """Whether the expertise of a task is file-heavy (i.e. compares fields)."""
+    return config.get('heavy', any([e.get('expert') == 'fields_in_file'
+                                    for e in config['experts']]))
+
+
+def process_task(taskdir, config_name=CONFIG_NAME, results_cache=None):
+    """
+    Process the expertise of a task, in its working directory,
+    writing its task_*.json as in-job.
+
+    :return: (taskdir, comparison status symbols by summary, error if any)
+    """
+    from ..task import ExpertBoard
+    cwd = os.getcwd()
+    os.chdir(taskdir)
+    try:
+        config = load_config(taskdir, config_name)
+        references = {}
+        for which in ('consistency', 'continuity'):
+            references[which] = [{'rh':LocalResourceHandler(r['kind'], r['path']),
+                                  'ref_is':{'task':r.get('task')}}
+                                 for r in config.get(which, [])]
+        board = ExpertBoard(config['experts'],
+                            lead_expert=config.get('lead_expert'),
+                            results_cache=results_cache,
+                            time_budget=config.get('time_budget'))
+        board.process(**references)
+        status = {which:getattr(board, which)['comparisonStatus']['symbol']
+                  for which in ('consistency', 'continuity')}
+        error = None
+    except Exception as e:
+        status = {}
+        error = '{}: {}'.format(type(e).__name__, e)
+    finally:
+        os.chdir(cwd)
+    return taskdir, status, error
+
+
+def run_tasks(tasks, config_name=CONFIG_NAME,
+              workers=None,
+              max_heavy=None,
+              results_cache=None,
+              progress=sys.stdout):
+    """
+    Process the expertise of **tasks**, in a pool of processes.
+
+    :param workers: number of processes (default: number of CPUs);
+        if 0, tasks are processed sequentially within the current process
+    :param max_heavy: maximum number of file-heavy tasks processed concurrently
+        (default: no other limit than **workers**)
+    :param progress: where to write progress (None for silence)
+    :return: the list of (taskdir, status, error), in the order of **tasks**
+    """
+    start = time.time()
+    results = {}
+
+    def report(result):
+        results[result[0]] = result
+        if progress is not None:
+            taskdir, status, error = result
+            state = error if error else ' '.join(['{}:{}'.format(k, v) for k, v in sorted(status.items())])
+            progress.write('[{}/{}] ({:.0f}s) {}: {}\n'.format(len(results), len(tasks),
+                                                               time.time() - start, taskdir, state))
+            progress.flush()
+
+    if workers == 0:
+        for taskdir in tasks:
+            report(process_task(taskdir, config_name, results_cache))
+    else:
+        if workers is None:
+            workers = os.cpu_count()
+        heavy = {}
+        pending = []
+        for taskdir in tasks:
+            try:
+                heavy[taskdir] = is_heavy(load_config(taskdir, config_name))
+            except Exception as e:
+                # a bad configuration fails its task only
+                report((taskdir, {}, '{}: {}'.format(type(e).__name__, e)))
+            else:
+                pending.append(taskdir)
+        running = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                # submit as long as workers are free, and heavy tasks are under their limit
+                heavy_running = len([t for t in running.values() if heavy[t]])
+                for taskdir in list(pending):
+                    if len(running) >= workers:
+                        break
+                    if heavy[taskdir]:
+                        if max_heavy is not None and heavy_running >= max_heavy:
+                            continue
+                        heavy_running += 1
+                    pending.remove(taskdir)
+                    running[executor.submit(process_task, taskdir, config_name, results_cache)] = taskdir
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    report(future.result())
+    return [results[t] for t in tasks]
+
+
+def main():
+    """Run the expertise of a campaign of tasks."""
+    args = get_args()
+    tasks = find_tasks(args.root, args.config)
+    print('Found {} tasks under: {}'.format(len(tasks), args.root))
+    results = run_tasks(tasks, args.config,
+                        workers=args.workers,
+                        max_heavy=args.max_heavy,
+                        results_cache=args.results_cache)
+    errors = [r for r in results if r[2]]
+    print('{} tasks processed, {} in error.'.format(len(results), len(errors)))
+    if errors:
+        sys.exit(1)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Run the expertise of a campaign of tasks.')
+    parser.add_argument('root',
+                        help="Root directory, under which to look for tasks working directories")
+    parser.add_argument('-c', '--config',
+                        help="Name of the expertise configuration file in tasks working directories",
+                        default=CONFIG_NAME)
+    parser.add_argument('-j', '--workers',
+                        help="Number of processes (default: number of CPUs; 0 for sequential processing)",
+                        type=int,
+                        default=None)
+    parser.add_argument('--max-heavy',
+                        help="Maximum number of concurrent file-heavy tasks (comparing fields)",
+                        type=int,
+                        default=None)
+    parser.add_argument('--results-cache',
+                        help="Directory of a cache of experts results, to skip unchanged parsings/comparisons",
+                        default=None)
+    return parser.parse_args()
@@ -6,16 +6,22 @@ A collection of Experts.
 Experts are meant to parse the result of a task, and eventually compare it
 to a reference.
 """
-import io
-import json
+import importlib
 
 import footprints
 
+from .caches import ListingsCache, reference_summaries
+
 
 class ExpertError(Exception):
     pass
 
 
+class ExpertTimeout(ExpertError):
+    """An expert has exceeded its time budget."""
+    pass
+
+
 class OutputExpert(footprints.FootprintBase):
 
     _abstract = True
@@ -32,11 +38,44 @@ class OutputExpert(footprints.FootprintBase):
                 optional = True,
                 default = False,
             ),
+            time_budget = dict(
+                info = ("Maximum time (s) allowed for each parsing/comparison by the expert, " +
+                        "after which it is interrupted (default: the ExpertBoard's one, if any)."),
+                type = float,
+                optional = True,
+                default = None,
+            ),
         )
     )
 
     #: If the expert measures about execution rather than result of an Algo (e.g. profiling experts).
     side_expert = False
+    #: If the expert compares to several sets of references at once (cf. :meth:`compare_multi`)
+    #: more efficiently than to each of them in turn.
+    multi_reference = False
+    #: Cache of listings shared with other experts, set by the ExpertBoard
+    listings_cache = None
+    #: Pools of workers shared with other experts, set by the ExpertBoard
+    #: (cf. :class:`~.caches.WorkersPools`)
+    workers_pools = None
+    #: Whether the output has been parsed yet
+    parsed = False
+
+    def __setstate__(self, state):
+        super(OutputExpert, self).__setstate__(state)
+        # unset attributes are marked by the very footprints.UNKNOWN object, not by an equal copy
+        for attr, value in self._attributes.items():
+            if value == footprints.UNKNOWN:
+                self._attributes[attr] = footprints.UNKNOWN
+
+    def input_files(self):
+        """
+        Files the parsing depends on (None if unknown), to identify its result
+        (e.g. in a :class:`~.caches.ResultsCache`).
+        By default, the **output** attribute, if any.
+        """
+        output = getattr(self, 'output', None)
+        return [output] if isinstance(output, str) else None
 
     def _parse(self):
         """Abstract method."""
@@ -44,8 +83,11 @@ class OutputExpert(footprints.FootprintBase):
 
     def parse(self):
         """Parse Output and return summary."""
+        self.parsed = True
         try:
             self._parse()
+        except ExpertTimeout:
+            raise
         except Exception as e:
             if self.fatal_exceptions:
                 raise
@@ -55,6 +97,8 @@ class OutputExpert(footprints.FootprintBase):
         else:
             try:
                 summary = self.summary()
+            except ExpertTimeout:
+                raise
             except Exception as e:
                 if self.fatal_exceptions:
                     raise
@@ -71,6 +115,8 @@ class OutputExpert(footprints.FootprintBase):
         """
         try:
             comp = self._compare(references, *args, **kwargs)
+        except ExpertTimeout:
+            raise
         except Exception as e:
             if self.fatal_exceptions:
                 raise
@@ -87,6 +133,33 @@ class OutputExpert(footprints.FootprintBase):
         """
         raise NotImplementedError('This is an abstract method. Must be implemented in actual expert.')
 
+    def compare_multi(self, references):
+        """
+        Compare to several sets of references (e.g. consistency and continuity ones).
+
+        :param references: dict of lists of reference resource handlers, by name of the set
+        :return: dict of comparisons, by name of the set
+        """
+        try:
+            comps = self._compare_multi(references)
+        except ExpertTimeout:
+            raise
+        except Exception as e:
+            if self.fatal_exceptions:
+                raise
+            else:
+                comps = {which:{'Comparison':'Failed',
+                                'Exception':str(e)}
+                         for which in references}
+        return comps
+
+    def _compare_multi(self, references):
+        """
+        Actual multiple comparison method: by default, compare to each set of references in turn.
+        To be overwritten by experts that have a :attr:`multi_reference` ability.
+        """
+        return {which:self._compare(refs) for which, refs in references.items()}
+
     @classmethod
     def filter_one_resource(cls, references, rkind):
         """Get kind=rkind resource, only one."""
@@ -100,17 +173,29 @@ class OutputExpert(footprints.FootprintBase):
         else:
             return references[0]
 
+    def _read_listing(self, filename, stripped=False):
+        """
+        Read a text output (listing) as a list of lines, through the shared
+        listings cache if available. The list must not be modified in place.
+
+        :param stripped: strip lines from leading and trailing blanks
+        """
+        cache = self.listings_cache if self.listings_cache is not None else ListingsCache()
+        if stripped:
+            return cache.stripped_lines(filename)
+        else:
+            return cache.lines(filename)
+
     def _compare_summaries(self, references, *args, **kwargs):
         """
         Compare to a reference summary.
         """
         ref_summary = self.filter_one_resource(references, rkind=('taskinfo', 'statictaskinfo'))
-        with io.open(ref_summary.container.localpath(), 'r') as _ref:
-            ref_summary_in = json.load(_ref)
+        ref_summary = ref_summary.container.localpath()
         try:
-            ref_summary_in = ref_summary_in[self.kind]
+            ref_summary_in = reference_summaries.get(ref_summary, self.kind)
         except KeyError:
-            if 'Crashed' in ref_summary_in['Status']['short']:
+            if 'Crashed' in reference_summaries.get(ref_summary, 'Status')['short']:
                 comp = {'symbol':'+',
                         'short':'+ Alive again +',
                         'text':'Task Ended, whereas reference was Crashed ! (so no comparison available)'}
@@ -137,9 +222,56 @@ class TextOutputExpert(OutputExpert):
     def _read_txt_output(self, filename=None):
         if filename is None:
             filename = self.output
-        with io.open(filename, 'r') as _file:
-            return [l.strip() for l in _file.readlines()]
+        return self._read_listing(filename, stripped=True)
+
+#: Modules defining experts, by kind of expert. Expert modules (and their
+#: dependencies) are imported on demand, registering their experts footprints.
+EXPERTS_MODULES = {'drHookMax':'profiling',
+                   'drHookAve':'profiling',
+                   'rss':'profiling',
+                   'bator_profile':'profiling',
+                   'joTables':'assim',
+                   'bator_obscount':'assim',
+                   'canari_stats':'assim',
+                   'setup':'setup',
+                   'gmkpack_build':'build',
+                   'codingnorms':'build',
+                   'norms':'norms'}
+#: Modules defining experts, by prefix of kind of expert
+EXPERTS_MODULES_BY_PREFIX = {'oops:':'oops'}
+#: Modules defining experts, by value of their *expert* attribute
+EXPERTS_MODULES_BY_EXPERT = {'fields_in_file':'fields'}
+
+
+def experts_module(expert_kwargs):
+    """Name of the module defining the expert described by **expert_kwargs**, or None if unknown."""
+    if expert_kwargs.get('expert') in EXPERTS_MODULES_BY_EXPERT:
+        return EXPERTS_MODULES_BY_EXPERT[expert_kwargs['expert']]
+    kind = expert_kwargs.get('kind', '')
+    for prefix, module in EXPERTS_MODULES_BY_PREFIX.items():
+        if kind.startswith(prefix):
+            return module
+    return EXPERTS_MODULES.get(kind)
+
+
+def load_experts(expert_kwargs=None):
+    """
+    Import the module defining the expert described by **expert_kwargs**,
+    for its footprint to be registered. If None or unknown, import all modules.
+    """
+    module = None if expert_kwargs is None else experts_module(expert_kwargs)
+    if module is None:
+        modules = sorted(set(EXPERTS_MODULES.values()) |
+                         set(EXPERTS_MODULES_BY_PREFIX.values()) |
+                         set(EXPERTS_MODULES_BY_EXPERT.values()))
+    else:
+        modules = [module]
+    for module in modules:
+        importlib.import_module('.' + module, __name__)
 
 
-from . import thresholds
-from . import oops, profiling, fields, assim, setup, build, norms
+def __getattr__(name):
+    """Import experts modules on first access."""
+    if name in ('oops', 'profiling', 'fields', 'assim', 'setup', 'build', 'norms', 'thresholds'):
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
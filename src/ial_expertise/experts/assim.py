@@ -5,7 +5,6 @@ import re
 import os
 
 from footprints import FPDict
-import arpifs_listings
 
 from . import OutputExpert, TextOutputExpert
 from .util import (difftree, comp_messages, ppp)
@@ -39,11 +38,12 @@ class JoTable(OutputExpert):
 
     def _parse(self):
         """Parse file, read all norms."""
-        self.listing = arpifs_listings.listings.OutputListing(self.output, 'Jo-tables')
-        self.listing.parse_patterns(flush_after_reading=True)
+        import arpifs_listings
+        self.jo_tables = arpifs_listings.jo_tables.JoTables(self.output,
+                                                            self._read_listing(self.output))
 
     def summary(self):
-        summary = self.listing.jo_tables.as_dict()
+        summary = self.jo_tables.as_dict()
         for k in summary.keys():
             for o in list(summary[k].keys()):
                 if summary[k][o][o]['n'] == 0:
@@ -57,8 +57,8 @@ class JoTable(OutputExpert):
                         summary[k][o][t]['jo/n'] = summary[k][o][t].pop('jon')
         return {'Jo-Tables':summary,
                 'Number of Tables':len(summary),
-                'Total Jo per Table':{table:self.listing.jo_tables[table].jo
-                                      for table in self.listing.jo_tables.keys()}
+                'Total Jo per Table':{table:self.jo_tables[table].jo
+                                      for table in self.jo_tables.keys()}
                 }
 
     def _compare(self, references):
@@ -111,11 +111,12 @@ class JoTable(OutputExpert):
     def _compare_listings(self, references,
                           validation_thresholds=JOTABLES):
         """Get listing among references resources, parse it and compare."""
+        import arpifs_listings
         ref_listing = self.filter_one_resource(references, rkind='plisting')
-        ref_listing_in = arpifs_listings.listings.OutputListing(
-            ref_listing.container.localpath(), 'Jo-tables')
-        ref_listing_in.parse_patterns(flush_after_reading=True)
-        return self._compare_2jotableset(self.listing.jo_tables, ref_listing_in.jo_tables,
+        ref_path = ref_listing.container.localpath()
+        ref_jo_tables = arpifs_listings.jo_tables.JoTables(ref_path,
+                                                           self._read_listing(ref_path))
+        return self._compare_2jotableset(self.jo_tables, ref_jo_tables,
                                          validation_thresholds=validation_thresholds)
 
 
@@ -152,6 +153,9 @@ class BatorObservationsCount(TextOutputExpert):
         listings = [f for f in loc_files if self._loc_listing_name.match(f)]
         return listings
 
+    def input_files(self):
+        return self._find_listings()
+
     @classmethod
     def _parse_text(cls, text):
         "Parse *text*, being a list of lines."
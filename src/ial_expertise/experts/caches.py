@@ -0,0 +1,444 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Caches shared among Experts, to avoid reading or parsing several times the
+same outputs (or starting several times the same workers).
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+
+from .util import open_summary, init_epygram, shutdown_executor
+
+
+def file_key(filename):
+    """
+    Identify a file by its (real path, inode, modification time), so that a
+    file that has been modified is not confused with its former version.
+    """
+    st = os.stat(filename)
+    return (os.path.realpath(filename), st.st_ino, st.st_mtime_ns)
+
+
+class _CachedListing(object):
+    """A text output, read lazily and only once."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._lines = None
+        self._stripped_lines = None
+
+    @property
+    def lines(self):
+        """Lines of the file, without trailing newline (as read by arpifs_listings)."""
+        with self._lock:
+            if self._lines is None:
+                with io.open(self.filename, 'r') as _file:
+                    self._lines = [l.rstrip('\n') for l in _file]
+        return self._lines
+
+    @property
+    def stripped_lines(self):
+        """Lines of the file, stripped from leading and trailing blanks."""
+        lines = self.lines
+        with self._lock:
+            if self._stripped_lines is None:
+                self._stripped_lines = [l.strip() for l in lines]
+        return self._stripped_lines
+
+
+class ListingsCache(object):
+    """
+    Cache of text outputs (listings), for each of them to be read only once
+    and shared among the experts of an ExpertBoard.
+
+    Listings are indexed by :func:`file_key`. The lists of lines returned are
+    shared, hence must not be modified in place.
+    """
+
+    def __init__(self):
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # neither locks nor contents are carried when pickled (e.g. to another process)
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def __len__(self):
+        return len(self._listings)
+
+    def _get(self, filename):
+        key = file_key(filename)
+        with self._lock:
+            listing = self._listings.get(key)
+            if listing is None:
+                # forget former versions of the same file
+                for k in [k for k in self._listings if k[0] == key[0]]:
+                    del self._listings[k]
+                listing = _CachedListing(filename)
+                self._listings[key] = listing
+        return listing
+
+    def lines(self, filename):
+        """Get lines of **filename**, without trailing newline."""
+        return self._get(filename).lines
+
+    def stripped_lines(self, filename):
+        """Get lines of **filename**, stripped from leading and trailing blanks."""
+        return self._get(filename).stripped_lines
+
+    def clear(self):
+        """Release all cached listings."""
+        with self._lock:
+            self._listings.clear()
+
+
+class ResourcesCache(object):
+    """
+    Cache of fields files (epygram resources) and of their fields inventories,
+    for files to be opened and their fields listed only once, e.g. by an expert
+    across its parsing and comparisons. Fingerprints of their fields may also
+    be kept, once computed (cf. :meth:`fingerprints`).
+
+    Inventories are indexed by :func:`file_key`, and shared (hence must not be
+    modified in place). Open resources are only shared sequentially:
+    :meth:`opened` hands a resource over to one user at a time, opening another
+    one if all are in use (e.g. by concurrent threads). At most **max_idle**
+    resources are kept open in between (files open at once are limited, e.g. in FA).
+    Open resources are not carried when pickled (e.g. to another process).
+    """
+
+    def __init__(self, max_idle=8):
+        self.max_idle = max_idle
+        self._inventories = {}
+        self._fingerprints = {}
+        self._idle = []  # (key, resource), least recently used first
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'max_idle':self.max_idle,
+                'inventories':self._inventories,
+                'fingerprints':self._fingerprints}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_idle'])
+        self._inventories.update(state['inventories'])
+        self._fingerprints.update(state['fingerprints'])
+
+    def _key(self, filename):
+        key = file_key(filename)
+        with self._lock:
+            if key not in self._inventories or key not in self._fingerprints:
+                # forget former versions of the same file
+                for cache in (self._inventories, self._fingerprints):
+                    for k in [k for k in cache if k[0] == key[0] and k != key]:
+                        del cache[k]
+                for k, resource in [i for i in self._idle if i[0][0] == key[0] and i[0] != key]:
+                    self._idle.remove((k, resource))
+                    resource.close()
+        return key
+
+    @contextlib.contextmanager
+    def opened(self, filename):
+        """Context manager providing **filename** open for reading, for exclusive use."""
+        key = self._key(filename)
+        resource = None
+        with self._lock:
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i][0] == key:
+                    resource = self._idle.pop(i)[1]
+                    break
+        if resource is None:
+            epygram = init_epygram()
+            resource = epygram.formats.resource(filename, 'r')
+        try:
+            yield resource
+        except BaseException:
+            resource.close()  # state unknown: not to be reused
+            raise
+        with self._lock:
+            self._idle.append((key, resource))
+            evicted = self._idle[:-self.max_idle] if self.max_idle > 0 else self._idle[:]
+            del self._idle[:len(evicted)]
+        for _, resource in evicted:
+            resource.close()
+
+    def listfields(self, filename):
+        """Fields identifiers in **filename**."""
+        key = self._key(filename)
+        with self._lock:
+            fids = self._inventories.get(key)
+        if fids is None:
+            with self.opened(filename) as resource:
+                fids = list(resource.listfields())
+            with self._lock:
+                self._inventories[key] = fids
+        return fids
+
+    def fingerprints(self, filename):
+        """
+        Fingerprints of the fields of **filename** computed so far, by field
+        identifier (as str): a dict shared by all users, to be completed in place.
+        """
+        key = self._key(filename)
+        with self._lock:
+            return self._fingerprints.setdefault(key, {})
+
+    def clear(self):
+        """Close all idle resources and release inventories and fingerprints."""
+        with self._lock:
+            idle = self._idle[:]
+            del self._idle[:]
+            self._inventories.clear()
+            self._fingerprints.clear()
+        for _, resource in idle:
+            resource.close()
+
+
+class MemoryAdmission(object):
+    """
+    Estimated memory (Mb) of the jobs admitted in a pool of workers, shared by
+    the comparisons using the pool, for them to stay together under a memory ceiling.
+    """
+
+    def __init__(self):
+        self.used = 0.
+        self.jobs = 0
+        self._condition = threading.Condition()
+
+    def admit(self, memory, max_memory):
+        """
+        Admit a job of **memory** if it fits under **max_memory**, or if no job
+        is admitted; return whether it is.
+        """
+        with self._condition:
+            if self.jobs > 0 and self.used + memory > max_memory:
+                return False
+            self.used += memory
+            self.jobs += 1
+            return True
+
+    def release(self, memory):
+        """Release the memory of a job that is done."""
+        with self._condition:
+            self.used -= memory
+            self.jobs -= 1
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Wait for the memory of a job to be released (at most **timeout** s)."""
+        with self._condition:
+            self._condition.wait(timeout)
+
+
+class WorkersPools(object):
+    """
+    Pools of workers (executors of :mod:`concurrent.futures`), shared by the
+    experts of a board and kept warm (initialized) across their comparisons,
+    until :meth:`shutdown`.
+
+    Pools are not carried when pickled (e.g. to another process): copies are
+    not persistent, i.e. each use gets a new pool, shut down right after.
+    """
+
+    def __init__(self, persistent=True):
+        self.persistent = persistent
+        self._pools = {}
+        self._users = {}  # number of comparisons using each executor
+        self._admissions = {}  # memory admitted in each pool, by key
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'persistent':False}
+
+    def __setstate__(self, state):
+        self.__init__(state['persistent'])
+
+    @contextlib.contextmanager
+    def executor(self, key, factory):
+        """
+        Context manager providing the pool of **key**, created by **factory**
+        (a callable returning an executor) if not running yet.
+        If interrupted (error, timeout), the pool is discarded, and shut down
+        without waiting for its running jobs once no other comparison uses it.
+        """
+        if not self.persistent:
+            with factory() as executor:
+                yield executor
+            return
+        with self._lock:
+            executor = self._pools.get(key)
+            if executor is None:
+                executor = self._pools[key] = factory()
+            self._users[executor] = self._users.get(executor, 0) + 1
+        interrupted = False
+        try:
+            yield executor
+        except BaseException:
+            interrupted = True
+            with self._lock:
+                if self._pools.get(key) is executor:
+                    del self._pools[key]
+            raise
+        finally:
+            with self._lock:
+                self._users[executor] -= 1
+                last = self._users[executor] == 0
+                if last:
+                    del self._users[executor]
+                discarded = last and self._pools.get(key) is not executor
+            if discarded:
+                shutdown_executor(executor, wait=not interrupted)
+
+    def admission(self, key):
+        """The :class:`MemoryAdmission` of the jobs of pool **key**, shared by its users."""
+        if not self.persistent:
+            return MemoryAdmission()
+        with self._lock:
+            return self._admissions.setdefault(key, MemoryAdmission())
+
+    def shutdown(self):
+        """Shut all pools down, waiting for their running jobs."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for executor in pools:
+            executor.shutdown()
+
+    def __len__(self):
+        return len(self._pools)
+
+
+class ReferenceSummaries(object):
+    """
+    Reference summaries (JSON task summaries), each file being parsed only once
+    and its expert subtrees shared among experts (hence not to be modified in place).
+    """
+
+    def __init__(self):
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename, key):
+        """
+        Get the subtree of summary **filename** at **key**.
+
+        :raise KeyError: if the summary does not contain **key**
+        """
+        fkey = file_key(filename)
+        with self._lock:
+            if fkey not in self._summaries:
+                with open_summary(filename) as _ref:
+                    self._summaries[fkey] = json.load(_ref)
+            return self._summaries[fkey][key]
+
+    def clear(self):
+        """Release all cached summaries."""
+        with self._lock:
+            self._summaries.clear()
+
+
+#: Reference summaries loaded in the current process
+reference_summaries = ReferenceSummaries()
+
+
+class ResultsCache(object):
+    """
+    On-disk cache of experts results (summaries and comparisons), indexed by
+    the expert kind and attributes, the code version, and the fingerprints of
+    the files the result depends on. Entries are evicted in the Least Recently
+    Used order when the total size of the cache exceeds **max_size**.
+    """
+
+    #: Available kinds of files fingerprints
+    fingerprints = ('stat', 'content')
+
+    def __init__(self, directory, max_size=1024, fingerprint='stat'):
+        """
+        :param directory: where to store the cache entries
+        :param max_size: maximum total size of the cache, in Mb
+        :param fingerprint: how files are identified:
+            'stat' by their (real path, size, mtime);
+            'content' by their (name, content hash) -- costs a full read of files
+        """
+        if fingerprint not in self.fingerprints:
+            raise ValueError("Unknown fingerprint: '{}', must be among {}".format(
+                fingerprint, self.fingerprints))
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self.fingerprint = fingerprint
+        os.makedirs(self.directory, exist_ok=True)
+
+    def file_fingerprint(self, filename):
+        """Fingerprint of a file."""
+        if self.fingerprint == 'stat':
+            st = os.stat(filename)
+            return [os.path.realpath(filename), st.st_size, st.st_mtime_ns]
+        else:
+            h = hashlib.sha256()
+            with io.open(filename, 'rb') as _file:
+                for block in iter(lambda: _file.read(2 ** 20), b''):
+                    h.update(block)
+            return [filename, h.hexdigest()]
+
+    def key(self, expert, step, files):
+        """
+        Key of the result of **step** by **expert**, depending on **files**.
+        """
+        from .. import __version__
+        identity = {'version':__version__,
+                    'expert':expert.footprint_export(),
+                    'step':step,
+                    'files':[self.file_fingerprint(f) for f in sorted(files)]}
+        identity = json.dumps(identity, sort_keys=True, default=str)
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """Get the result stored under **key**, or None if absent."""
+        entry = self._entry(key)
+        try:
+            with io.open(entry, 'r') as _entry:
+                result = json.load(_entry)
+            os.utime(entry)  # recently used
+        except (OSError, ValueError):  # absent, or evicted/corrupted in between
+            result = None
+        return result
+
+    def put(self, key, result):
+        """Store **result** under **key**, then evict old entries if needed."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with io.open(fd, 'w') as _entry:
+            json.dump(result, _entry)
+        os.replace(tmp, self._entry(key))  # atomic, concurrent writers safe
+        self._evict()
+
+    def _evict(self):
+        """Remove the least recently used entries, until total size is lower than max_size."""
+        entries = []
+        for e in os.scandir(self.directory):
+            if e.name.endswith('.json'):
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+        total_size = sum([e[1] for e in entries])
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size * 1024 ** 2:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # concurrently removed
+                pass
+            total_size -= size
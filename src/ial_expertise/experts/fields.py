@@ -1,20 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """Fields parsers."""
+import contextlib
+import hashlib
 import io
 import numpy
 import os
 import re
+import threading
+import time
 
 from footprints import FPList, proxy as fpx
 from bronx.fancies import loggers
 from taylorism import Worker, batch_main
 
-from . import OutputExpert, ExpertError
-from .thresholds import NORMALIZED_FIELDS_DIFF, EPSILON
+from . import OutputExpert, ExpertError, ExpertTimeout
+from .thresholds import NORMALIZED_FIELDS_DIFF
+from .caches import ResourcesCache, WorkersPools
+from .util import open_summary, identical_files, init_epygram, shutdown_executor, report_measure, ReadAhead
 
 logger = loggers.getLogger(__name__)
 
+#: Backends of parallel comparisons of files (cf. :func:`compare_pairs`)
+PARALLEL_BACKENDS = ('taylorism', 'processes', 'threads', 'serial')
+
 
 class FieldsInFileExpert(OutputExpert):
 
@@ -80,15 +89,88 @@ class FieldsInFileExpert(OutputExpert):
                 optional = True,
                 default = False
             ),
+            extended_stats = dict(
+                info = "Also compute std and count NaN values, if compute_stats.",
+                type = bool,
+                optional = True,
+                default = False
+            ),
+            read_ahead = dict(
+                info = ("If not parallel, number of upcoming files (or sets of files, compared together) " +
+                        "read ahead in background while comparing current ones, to overlap I/O and computation."),
+                type = int,
+                optional = True,
+                default = 0,
+            ),
             parallel = dict(
-                info = "Compute comparisons with multiple processes using taylorism.",
+                info = "Compute comparisons of files in parallel (cf. parallel_backend).",
                 type = bool,
                 optional = True,
                 default = False
-            )
+            ),
+            parallel_backend = dict(
+                info = ("Backend of parallel comparisons: 'taylorism' workers, 'processes' or 'threads' " +
+                        "pools (threads are lighter, but not all formats libraries are thread-safe), or 'serial'. " +
+                        "Workers of pools are kept warm across the comparisons of the experts of a board."),
+                values = list(PARALLEL_BACKENDS),
+                optional = True,
+                default = 'taylorism',
+            ),
+            parallel_workers = dict(
+                info = ("Number of workers of parallel comparisons (0: default of the backend, " +
+                        "i.e. half the CPUs for taylorism, the available CPUs for pools)."),
+                type = int,
+                optional = True,
+                default = 0,
+            ),
+            parallel_binding = dict(
+                info = "Bind the workers of parallel comparisons to CPUs ('taylorism' and 'processes' backends).",
+                type = bool,
+                optional = True,
+                default = False,  # issue with nmipt
+            ),
+            parallel_memory = dict(
+                info = ("Memory ceiling (Mb) of parallel comparisons: pairs of files are compared " +
+                        "as long as the total of their estimated peak memory stays under it. " +
+                        "If None, not limited."),
+                type = float,
+                optional = True,
+                default = None,
+            ),
+            memory_budget = dict(
+                info = ("Memory (Mb) allowed (per worker, if parallel) for the temporaries of each " +
+                        "fields data comparison, computed by chunks. If None, chunks of a few " +
+                        "thousands values, for the temporaries to stay in cache."),
+                type = float,
+                optional = True,
+                default = None,
+            ),
+            fields_workers = dict(
+                info = ("Number of processes among which to split the statistics (if compute_stats) " +
+                        "and the comparison of the fields of each file (in each taylorism worker, if parallel)."),
+                type = int,
+                optional = True,
+                default = 1,
+            ),
+            raw_precheck = dict(
+                info = ("Report fields which raw (encoded) records are identical as bit-repro, " +
+                        "without decoding them (FA and GRIB files)."),
+                type = bool,
+                optional = True,
+                default = True,
+            ),
+            reference_index = dict(
+                info = ("Use (and store) a sidecar index of fields digests and statistics of " +
+                        "reference files, for bit-repro fields not to be read from references."),
+                type = bool,
+                optional = True,
+                default = False,
+            ),
         )
     )
 
+    multi_reference = True
+
     # reference prefixes
     ref_prefix = 'ref.'
     cnty_prefix = 'continuity.'
@@ -118,9 +200,11 @@ class FieldsInFileExpert(OutputExpert):
             f"Unknown kind={self.kind}, please change or specify 'filename_re_pattern'."
             self._attributes['filename_re_pattern'] = self._filename_re_patterns[self.kind]
         self._filename_re = re.compile(self.filename_re_pattern)
+        # files and fields lists shared by parsing and comparisons
+        self.resources = ResourcesCache()
 
-    def _find_files_to_parse(self):
-        self.files = {}
+    def _files_to_parse(self):
+        files = []
         if len(self.filenames) > 0:
             for f in self.filenames:
                 if f not in os.listdir(os.getcwd()):
@@ -130,28 +214,40 @@ class FieldsInFileExpert(OutputExpert):
                     else:
                         logger.warning(' '.join([message," => ignored in comparison."]))
                 else:
-                    self.files[f] = {}
+                    files.append(f)
         else:
             # find files in working directory
             filenames = os.listdir(os.getcwd())
             for f in filenames:
-                if self.filename_re.match(f):
-                    self.files[f] = {}
+                if self._filename_re.match(f):
+                    files.append(f)
+        return files
+
+    def _find_files_to_parse(self):
+        self.files = {f:{} for f in self._files_to_parse()}
+
+    def input_files(self):
+        return self._files_to_parse()
 
     def _parse(self):
         """Parse file, list fields."""
-        import epygram
-        epygram.init_env()
         self._find_files_to_parse()
+        fields = []
         for filename in self.files:
-            r = epygram.formats.resource(filename, 'r')
-            self.files[filename] = {str(f):{} for f in r.listfields()}
-            if self.compute_stats:
-                for f in r.listfields():
-                    fld = r.readfield(f)
-                    self.files[filename][str(f)]['min'] = fld.min()
-                    self.files[filename][str(f)]['avg'] = fld.mean()
-                    self.files[filename][str(f)]['max'] = fld.max()
+            fids = self.resources.listfields(filename)
+            self.files[filename] = {str(f):{} for f in fids}
+            fields.extend([(filename, f) for f in fids])
+        if self.compute_stats:
+            # fields being read, fingerprint them to be matched with references indexes in comparison
+            results = compute_fields_stats(fields,
+                                           extended=self.extended_stats,
+                                           fingerprints=self.reference_index,
+                                           workers=self.fields_workers,
+                                           resources=self.resources)
+            for (filename, f), (stats, fingerprint) in zip(fields, results):
+                self.files[filename][str(f)].update(stats)
+                if fingerprint is not None:
+                    self.resources.fingerprints(filename)[str(f)] = fingerprint
 
     def summary(self):
         summary = {'Number of files':len(self.files),
@@ -225,6 +321,19 @@ class FieldsInFileExpert(OutputExpert):
                 pairs.append((f, ref))
         return pairs
 
+    def _comparison_kwargs(self):
+        """Arguments of :func:`compare_2_files` from the expert's attributes."""
+        return dict(ignore_meta=self.ignore_meta,
+                    ignore_orphan_fields=self.ignore_orphan_fields,
+                    hide_bit_repro_fields=self.hide_bit_repro_fields,
+                    validate_if_bit_repro_only=self.validate_if_bit_repro_only,
+                    normalized_validation_threshold=self.normalized_validation_threshold,
+                    fatal_exceptions=self.fatal_exceptions,
+                    memory_budget=self.memory_budget,
+                    fields_workers=self.fields_workers,
+                    raw_precheck=self.raw_precheck,
+                    reference_index=self.reference_index)
+
     def _compare(self, references):
         """
         Compare to a reference.
@@ -235,31 +344,69 @@ class FieldsInFileExpert(OutputExpert):
         comp = {}
         if len(pairs) > 0:
             if not self.parallel:
-                for (test, ref) in pairs:
-                    logger.info('{} // {}'.format(test, ref))
-                    comp[test] = compare_2_files(test, ref,
-                                                 ignore_meta=self.ignore_meta,
-                                                 ignore_orphan_fields=self.ignore_orphan_fields,
-                                                 hide_bit_repro_fields=self.hide_bit_repro_fields,
-                                                 validate_if_bit_repro_only=self.validate_if_bit_repro_only,
-                                                 normalized_validation_threshold=self.normalized_validation_threshold,
-                                                 fatal_exceptions=self.fatal_exceptions)
+                with ReadAhead(pairs, depth=self.read_ahead) as read_ahead:
+                    for (test, ref) in read_ahead:
+                        logger.info('{} // {}'.format(test, ref))
+                        comp[test] = compare_2_files(test, ref, resources=self.resources,
+                                                     **self._comparison_kwargs())
             else:
-                report = batch_main(common_instructions=dict(ignore_meta=self.ignore_meta,
-                                                             ignore_orphan_fields=self.ignore_orphan_fields,
-                                                             hide_bit_repro_fields=self.hide_bit_repro_fields,
-                                                             validate_if_bit_repro_only=self.validate_if_bit_repro_only,
-                                                             normalized_validation_threshold=self.normalized_validation_threshold,
-                                                             fatal_exceptions=self.fatal_exceptions),
-                                    individual_instructions=dict(test=[p[0] for p in pairs],
-                                                                 ref=[p[1] for p in pairs]),
-                                    scheduler=fpx.scheduler(limit='threads', max_threads=0, binded=False),  # issue with nmipt
-                                    #scheduler=fpx.scheduler(limit='threads', max_threads=0, binded=True),
-                                    print_report=lambda arg: None)
-                for file_report in report['workers_report']:
-                    test_filename = file_report['report'][0]
-                    file_comparison = file_report['report'][1]
-                    comp[test_filename] = file_comparison
+                comp, throughput = compare_pairs(pairs,
+                                                 backend=self.parallel_backend,
+                                                 workers=self.parallel_workers,
+                                                 binding=self.parallel_binding,
+                                                 max_memory=self.parallel_memory,
+                                                 pools=self.workers_pools,
+                                                 resources=self.resources,
+                                                 **self._comparison_kwargs())
+                report_measure('Workers throughput', throughput)
+        return self._overall_comparison(comp, pairs)
+
+    def _compare_multi(self, references):
+        """
+        Compare to several sets of references, each test file being compared
+        to all its references at once (test fields are read only once).
+        With the 'taylorism' parallel backend, compare to each set of references in turn.
+
+        :param references: dict of lists of reference resource handlers, by name of the set
+        """
+        if self.parallel and self.parallel_backend == 'taylorism':
+            return super(FieldsInFileExpert, self)._compare_multi(references)
+        pairs = {which:self._make_pairs(refs) for which, refs in references.items()}
+        comps = {which:{} for which in references}
+        tests = []
+        for which_pairs in pairs.values():
+            tests.extend([test for (test, _) in which_pairs if test not in tests])
+        tests = [(test, [(which, ref) for which, which_pairs in pairs.items()
+                         for (t, ref) in which_pairs if t == test])
+                 for test in tests]
+        if self.parallel:
+            files_comps, throughput = compare_pairs([(test,) + tuple([ref for _, ref in refs]) for test, refs in tests],
+                                                    backend=self.parallel_backend,
+                                                    workers=self.parallel_workers,
+                                                    binding=self.parallel_binding,
+                                                    max_memory=self.parallel_memory,
+                                                    pools=self.workers_pools,
+                                                    resources=self.resources,
+                                                    **self._comparison_kwargs())
+            report_measure('Workers throughput', throughput)
+            files_comps = {test:files_comps[test] if len(refs) > 1 else [files_comps[test]]
+                           for test, refs in tests}
+        else:
+            files_comps = {}
+            with ReadAhead(tests, depth=self.read_ahead,
+                           files=lambda item: [item[0]] + [ref for _, ref in item[1]]) as read_ahead:
+                for test, refs in read_ahead:
+                    logger.info('{} // {}'.format(test, ' & '.join([ref for _, ref in refs])))
+                    files_comps[test] = compare_files(test, [ref for _, ref in refs], resources=self.resources,
+                                                      **self._comparison_kwargs())
+        for test, refs in tests:
+            for (which, _), comp in zip(refs, files_comps[test]):
+                comps[which][test] = comp
+        return {which:self._overall_comparison(comps[which], pairs[which]) for which in references}
+
+    def _overall_comparison(self, comp, pairs):
+        """Complete the comparisons of the files of **pairs** with an overall status."""
+        if len(pairs) > 0:
             overall = {}
             overall['Validated'] = all([c.get('Validated') for c in comp.values()])
             overall['Bit-reproducible'] = all([c.get('Bit-reproducible') for c in comp.values()])
@@ -288,7 +435,12 @@ def compare_2_files(test, ref,
                     validate_if_bit_repro_only=True,
                     normalized_validation_threshold=NORMALIZED_FIELDS_DIFF,
                     fatal_exceptions=True,
-                    verbose=False):
+                    verbose=False,
+                    memory_budget=None,
+                    fields_workers=1,
+                    raw_precheck=True,
+                    reference_index=False,
+                    resources=None):
     """
     Compare 2 files containing fields.
 
@@ -302,40 +454,396 @@ def compare_2_files(test, ref,
     :param validate_if_bit_repro_only: If True, Validated == Bit-repro; else, use normalized_validation_threshold.
     :param normalized_validation_threshold: Threshold on normalized distance for validation.
     :param fatal_exceptions: Raise comparing errors.
+    :param memory_budget: if not None, memory (Mb) allowed for the temporaries
+        of each field data comparison, then computed by chunks
+    :param fields_workers: number of processes among which to split the
+        comparison of common fields, each opening its own resources
+    :param raw_precheck: report fields which raw records are identical as
+        bit-repro, without decoding them (cf. :class:`RawRecords`)
+    :param reference_index: use (and update) the sidecar index of **ref**,
+        for bit-repro fields not to be read from it (cf. :class:`FieldsIndex`)
+    :param resources: a :class:`~.caches.ResourcesCache` through which to open
+        files and list their fields, if shared with other comparisons
     """
-    import epygram
-    epygram.init_env()
-    t = epygram.formats.resource(test, 'r')
-    r = epygram.formats.resource(ref, 'r')
+    return compare_files(test, [ref],
+                         ignore_meta=ignore_meta,
+                         ignore_orphan_fields=ignore_orphan_fields,
+                         hide_bit_repro_fields=hide_bit_repro_fields,
+                         validate_if_bit_repro_only=validate_if_bit_repro_only,
+                         normalized_validation_threshold=normalized_validation_threshold,
+                         fatal_exceptions=fatal_exceptions,
+                         memory_budget=memory_budget,
+                         fields_workers=fields_workers,
+                         raw_precheck=raw_precheck,
+                         reference_index=reference_index,
+                         resources=resources)[0]
+
+
+def compare_pairs(pairs,
+                  backend='taylorism',
+                  workers=0,
+                  binding=False,
+                  max_memory=None,
+                  resources=None,
+                  pools=None,
+                  **kwargs):
+    """
+    Compare the files of (test, ref) **pairs**, distributed among the workers
+    of a parallel **backend**, largest files first (cf. :func:`largest_first`).
+    Workers of pools are initialized once (epygram imported and initialized).
+    Apart from the 'taylorism' backend, a test file may be compared to several
+    references at once, test fields being read only once: (test, ref1, ref2...).
+
+    :param backend: among :data:`PARALLEL_BACKENDS`: 'taylorism' workers,
+        'processes' or 'threads' pools (of :mod:`concurrent.futures`), or 'serial'
+    :param workers: number of workers (0: default of the backend, i.e. half
+        the CPUs for taylorism, the available CPUs for pools)
+    :param binding: bind workers to CPUs ('taylorism' and 'processes' backends)
+    :param max_memory: if not None, memory ceiling (Mb): comparisons are admitted
+        as long as the total of their estimated peak memory (cf. :func:`estimated_memory`)
+        stays under it (a comparison is always admitted if none is running);
+        with pools, the ceiling applies to all comparisons using the same pool
+    :param resources: a :class:`~.caches.ResourcesCache`, shared by comparisons
+        of the 'threads' and 'serial' backends
+    :param pools: :class:`~.caches.WorkersPools` from which to get the pool of
+        workers ('processes' and 'threads' backends), to be kept warm for other
+        comparisons; if None, a new pool is used and shut down right away
+    :param kwargs: arguments of :func:`compare_2_files`
+    :return: the comparisons by test file (in the order of **pairs**; a list
+        of comparisons for several references), and the throughput of each
+        worker (cf. :func:`workers_throughput`)
+    """
+    import concurrent.futures
+    if backend not in PARALLEL_BACKENDS:
+        raise ExpertError("Unknown parallel backend: '{}', must be among {}".format(backend, PARALLEL_BACKENDS))
+    if backend == 'taylorism' and any([len(p) > 2 for p in pairs]):
+        raise ExpertError("The 'taylorism' backend compares a test file to one reference at once")
+    scheduled = largest_first(pairs)
+    memory = {}
+    if max_memory is not None and backend != 'serial':
+        memory = {pair:estimated_memory(pair,
+                                        memory_budget=kwargs.get('memory_budget'),
+                                        fields_workers=kwargs.get('fields_workers', 1),
+                                        resources=resources)
+                  for pair in scheduled}
+        for pair in scheduled:
+            if memory[pair] > max_memory:
+                logger.warning('Comparison of {} estimated to {:.0f}Mb, '.format(' // '.join(pair), memory[pair]) +
+                               'over the memory ceiling ({:.0f}Mb): compared alone'.format(max_memory))
+    if backend == 'taylorism':
+        individual_instructions = dict(test=[p[0] for p in scheduled],
+                                       ref=[p[1] for p in scheduled])
+        if memory:
+            # the longer first scheduler starts the largest files first, under the memory ceiling;
+            # a comparison over the ceiling would never be started: declared at the ceiling, it runs alone
+            individual_instructions.update(memory=[min(memory[p], max_memory) for p in scheduled],
+                                           expected_time=[float(_files_size(p)) for p in scheduled])
+            scheduler = fpx.scheduler(limit='threads+memory', max_threads=workers, max_memory=max_memory,
+                                      binded=binding)
+        else:
+            scheduler = fpx.scheduler(limit='threads', max_threads=workers, binded=binding)
+        report = batch_main(common_instructions=kwargs,
+                            individual_instructions=individual_instructions,
+                            scheduler=scheduler,
+                            print_report=lambda arg: None)
+        results = [r['report'] for r in report['workers_report']]
+    elif backend == 'serial':
+        results = [_timed_comparison(*pair, resources=resources, **kwargs) for pair in scheduled]
+    else:
+        if workers == 0:
+            workers = len(_available_cpus())
+        if backend == 'threads':
+            binding = False
+            kwargs = dict(kwargs, resources=resources)
+        if pools is None:
+            pools = WorkersPools(persistent=False)
+        results = []
+        pending = list(scheduled)
+        running = {}
+        key = ('fields', backend, workers, binding)
+        admission = pools.admission(key)  # memory of the jobs of all comparisons using the pool
+        with pools.executor(key, lambda: _new_pool(backend, workers, binding)) as executor:
+            try:
+                while pending or running:
+                    # submit as long as workers are free, and estimated memory is under the ceiling
+                    for pair in list(pending):
+                        if len(running) >= workers:
+                            break
+                        if memory and not admission.admit(memory[pair], max_memory):
+                            continue  # a smaller one may fit
+                        pending.remove(pair)
+                        future = executor.submit(_timed_comparison, *pair, **kwargs)
+                        if memory:
+                            future.add_done_callback(lambda _, m=memory[pair]: admission.release(m))
+                        running[future] = pair
+                    if not running:  # memory is used by other comparisons
+                        admission.wait(timeout=1.)
+                        continue
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        running.pop(future)
+                        results.append(future.result())
+            except BaseException:
+                # the pool may be shared with other comparisons: only cancel the jobs of this one
+                for future in running:
+                    future.cancel()
+                raise
+    comps = {test:comp for test, comp, _ in results}
+    throughput = workers_throughput([measure for _, _, measure in results])
+    for worker, measures in throughput.items():
+        logger.info('Worker {}: {}'.format(worker, ', '.join(['{}={}'.format(k, v) for k, v in measures.items()])))
+    return {pair[0]:comps[pair[0]] for pair in pairs}, throughput
+
+
+#: Base memory (Mb) of a comparison worker (interpreter, epygram and formats libraries)
+_WORKER_MEMORY = 256.
+#: Number of float64 arrays of the largest field alive at once in a field comparison:
+#: test and ref data, and the temporaries of their decoding
+_FIELD_COPIES = 4
+
+
+def estimated_memory(pair, memory_budget=None, fields_workers=1, resources=None):
+    """
+    Estimated peak memory (Mb) of the comparison of the files of **pair**,
+    from the dimensions of their largest field (cf. :func:`largest_field_size`).
+
+    :param memory_budget: memory (Mb) allowed for the temporaries of each field
+        data comparison (cf. :func:`compare_2_fields`)
+    :param fields_workers: number of processes comparing fields concurrently
+    """
+    largest = max([largest_field_size(f, resources=resources) for f in pair])
+    if memory_budget is None:
+        memory_budget = _STATS_BLOCK * _CHUNK_TEMPORARIES * 8. / 1024 ** 2
+    field = largest * _FIELD_COPIES * 8. / 1024 ** 2 + memory_budget
+    if fields_workers > 1:
+        return _WORKER_MEMORY + fields_workers * (_WORKER_MEMORY + field)
+    return _WORKER_MEMORY + field
+
+
+def largest_field_size(filename, resources=None):
+    """
+    Number of values of the largest field of **filename**, as read to be compared,
+    without decoding fields: from the GRIB messages headers, or the FA frame.
+    Otherwise, at most as many as float64 values in the file.
+    """
+    with io.open(filename, 'rb') as f:
+        grib = f.read(4) == b'GRIB'
+    if grib:
+        import eccodes
+        largest = 0
+        with io.open(filename, 'rb') as f:
+            while True:
+                gid = eccodes.codes_grib_new_from_file(f, headers_only=True)
+                if gid is None:
+                    break
+                try:
+                    largest = max(largest, eccodes.codes_get(gid, 'numberOfDataPoints'))
+                finally:
+                    eccodes.codes_release(gid)
+        return largest
+    if resources is None:
+        resources = ResourcesCache(max_idle=0)
+    try:
+        with resources.opened(filename) as r:
+            if r.format == 'FA':  # spectral fields are converted to gridpoint, on the frame
+                return int(numpy.prod(r.geometry.get_datashape()))
+    except Exception as e:
+        logger.warning('Unable to find the largest field of {}: {}'.format(filename, e))
+    return os.path.getsize(filename) // 8
+
+
+def largest_first(pairs):
+    """
+    Sort (test, ref) **pairs** of files by decreasing size on disk, for a
+    large file not to be compared alone at the tail of a parallel comparison.
+    """
+    return sorted(pairs, key=_files_size, reverse=True)
+
+
+def _files_size(filenames):
+    """Total size of **filenames** on disk (those which exist)."""
+    return sum([os.path.getsize(f) for f in filenames if os.path.exists(f)])
+
+
+def _available_cpus():
+    """CPUs available to the current process."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def _new_pool(backend, workers, binding=False):
+    """A new pool ('processes' or 'threads' **backend**) of **workers**, initialized by :func:`_init_worker`."""
+    import concurrent.futures
+    if backend == 'threads':
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers, initializer=_init_worker)
+    counter = None
+    if binding:
+        import multiprocessing
+        counter = multiprocessing.Value('i', 0)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                  initargs=(counter,))
+
+
+def _init_worker(counter=None):
+    """Initialize a worker of a pool: bound to a CPU (if **counter**, cf. :func:`_bind_to_cpu`), and epygram."""
+    if counter is not None:
+        _bind_to_cpu(counter)
+    init_epygram()
+
+
+def _bind_to_cpu(counter):
+    """Bind the current (worker) process to a CPU, in turn as counted by **counter** among workers."""
+    cpus = _available_cpus()
+    with counter.get_lock():
+        cpu = cpus[counter.value % len(cpus)]
+        counter.value += 1
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+
+def _timed_comparison(test, *refs, **kwargs):
+    """
+    Compare a file to one or several reference files (cf. :func:`compare_files`).
+
+    :return: (test, comparison -- a list of comparisons if several **refs**,
+        (worker, size of files, elapsed time))
+    """
+    t0 = time.perf_counter()
+    comps = compare_files(test, list(refs), **kwargs)
+    worker = '{}/{}'.format(os.getpid(), threading.current_thread().name)
+    return (test, comps[0] if len(refs) == 1 else comps,
+            (worker, _files_size((test,) + refs), time.perf_counter() - t0))
+
+
+def workers_throughput(measures):
+    """
+    Throughput of each worker of a parallel comparison of files,
+    from the (worker, size of files, elapsed time) **measures** of each comparison.
+    """
+    throughput = {}
+    for worker, size, elapsed in measures:
+        w = throughput.setdefault(worker, {'Files':0, 'Size (Mb)':0., 'Busy time (s)':0.})
+        w['Files'] += 1
+        w['Size (Mb)'] += size / 1024. ** 2
+        w['Busy time (s)'] += elapsed
+    for w in throughput.values():
+        w['Throughput (Mb/s)'] = round(w['Size (Mb)'] / w['Busy time (s)'], 1) if w['Busy time (s)'] > 0 else None
+        w['Size (Mb)'] = round(w['Size (Mb)'], 1)
+        w['Busy time (s)'] = round(w['Busy time (s)'], 3)
+    return throughput
+
+
+def compare_files(test, refs,
+                  ignore_meta=False,
+                  ignore_orphan_fields=False,
+                  hide_bit_repro_fields=True,
+                  validate_if_bit_repro_only=True,
+                  normalized_validation_threshold=NORMALIZED_FIELDS_DIFF,
+                  fatal_exceptions=True,
+                  memory_budget=None,
+                  fields_workers=1,
+                  raw_precheck=True,
+                  reference_index=False,
+                  resources=None):
+    """
+    Compare a file containing fields to each of several reference files
+    (e.g. consistency and continuity ones), each test field being read once
+    for all references.
+
+    Arguments are those of :func:`compare_2_files`.
+
+    :return: the list of comparisons, one for each of **refs**
+    """
+    own_resources = resources is None
+    if own_resources:
+        resources = ResourcesCache()
+    report_kwargs = dict(ignore_orphan_fields=ignore_orphan_fields,
+                         hide_bit_repro_fields=hide_bit_repro_fields,
+                         validate_if_bit_repro_only=validate_if_bit_repro_only,
+                         normalized_validation_threshold=normalized_validation_threshold)
+    comps = [None for _ in refs]
+    test_list = resources.listfields(test)
+    compared = []  # (index in refs, ref, ref fields list, fields to compare)
+    for i, ref in enumerate(refs):
+        # identical files: all fields are bit-repro, no need to read ref nor any field
+        identical = identical_files(test, ref)
+        ref_list = test_list if identical else resources.listfields(ref)
+        fids = _common_fields(test_list, ref_list)
+        if identical:
+            comps[i] = _files_comparison(test_list, ref_list,
+                                         [(f, bit_repro_status(not ignore_meta), True) for f in fids], 0.,
+                                         **report_kwargs)
+        else:
+            compared.append((i, ref, ref_list, fids))
+    if compared:
+        ref_indexes = [FieldsIndex(c[1]) for c in compared] if reference_index else None
+        comparison_kwargs = dict(ignore_meta=ignore_meta,
+                                 normalized_validation_threshold=normalized_validation_threshold,
+                                 memory_budget=memory_budget,
+                                 fatal_exceptions=fatal_exceptions,
+                                 raw_precheck=raw_precheck,
+                                 ref_indexes=ref_indexes,
+                                 test_fingerprints=dict(resources.fingerprints(test)))
+        compared_refs = [c[1] for c in compared]
+        compared_fids = [c[3] for c in compared]
+        if fields_workers > 1 and len(_union(compared_fids)) > 1:
+            if raw_precheck:
+                # raw records are scanned once, rather than by each batch
+                with contextlib.ExitStack() as opened:
+                    t = opened.enter_context(resources.opened(test))
+                    rs = [opened.enter_context(resources.opened(ref)) for ref in compared_refs]
+                    comparison_kwargs['raw_identical'] = _raw_identical(t, rs, compared_fids)
+            results = _compare_fields_concurrently(test, compared_refs, compared_fids, fields_workers,
+                                                   **comparison_kwargs)
+        else:
+            with contextlib.ExitStack() as opened:
+                t = opened.enter_context(resources.opened(test))
+                rs = [opened.enter_context(resources.opened(ref)) for ref in compared_refs]
+                results = compare_fields_multi(t, rs, compared_fids, **comparison_kwargs)
+        for ref_index in ref_indexes or []:
+            ref_index.save()
+        for (i, _, ref_list, _), (statuses, max_normalized_diff) in zip(compared, results):
+            comps[i] = _files_comparison(test_list, ref_list, statuses, max_normalized_diff,
+                                         **report_kwargs)
+    if own_resources:
+        resources.clear()
+    return comps
+
+
+def _common_fields(test_list, ref_list):
+    """Fields to be compared, among those present in both lists."""
+    intersection = [f for f in test_list if f in ref_list]
+    if len(intersection) > 0 and isinstance(intersection[0], str):
+        intersection = sorted(intersection)
+    return [f for f in intersection if not ignore_field(f)]
+
+
+def _union(fids_lists):
+    """Union of lists of fields, each field at its first position."""
+    union = {}
+    for fids in fids_lists:
+        for f in fids:
+            union.setdefault(str(f), f)
+    return list(union.values())
+
+
+def _files_comparison(test_list, ref_list, statuses, max_normalized_diff,
+                      ignore_orphan_fields=False,
+                      hide_bit_repro_fields=True,
+                      validate_if_bit_repro_only=True,
+                      normalized_validation_threshold=NORMALIZED_FIELDS_DIFF):
+    """Comparison report of 2 files, from the **statuses** of their common fields."""
     comp = {}
-    # list fields
-    test_list = list(t.listfields())
-    ref_list = list(r.listfields())
     # new and lost
     new_fields = [f for f in test_list if f not in ref_list]
     lost_fields = [f for f in ref_list if f not in test_list]
     # errors
     uncompared_fields = []
-    # common fields: comparison
-    intersection = [f for f in test_list if f in ref_list]
-    if len(intersection) > 0 and isinstance(intersection[0], str):
-        intersection = sorted(intersection)
     fields_status = {}
-    max_normalized_diff = 0.
-    for f in intersection:
-        if ignore_field(f):
-            continue
-        try:
-            (status,
-             max_normalized_diff) = compare_2_fields(t, r, f, max_normalized_diff,
-                                                     ignore_meta=ignore_meta,
-                                                     normalized_validation_threshold=normalized_validation_threshold)
-        except Exception as e:
-            if fatal_exceptions:
-                raise
-            else:
-                uncompared_fields.append(f)
-            status = {'Error during comparison':str(e)}
+    for f, status, compared in statuses:
+        if not compared:
+            uncompared_fields.append(f)
         if not status.get('Data bit-repro', False) or not hide_bit_repro_fields:
             fields_status[str(f)] = status
     # status over all fields
@@ -364,11 +872,298 @@ def compare_2_files(test, ref,
     return comp
 
 
+def compare_fields(test_resource, ref_resource, fids,
+                   max_normalized_diff=0.,
+                   ref_index=None,
+                   **kwargs):
+    """
+    Compare fields **fids**, present in both resources.
+
+    :param max_normalized_diff: maximum normalized difference to be updated
+    :param ref_index: a :class:`FieldsIndex` of **ref_resource**
+    :param kwargs: passed to :func:`compare_fields_multi`
+    :return: the list of (fid, status, compared) and the maximum normalized difference
+    """
+    [(statuses, ref_max)] = compare_fields_multi(test_resource, [ref_resource], [fids],
+                                                 ref_indexes=[ref_index], **kwargs)
+    return statuses, max(max_normalized_diff, ref_max)
+
+
+def compare_fields_multi(test_resource, ref_resources, fids,
+                         fatal_exceptions=True,
+                         raw_precheck=False,
+                         raw_identical=None,
+                         ref_indexes=None,
+                         test_fingerprints=None,
+                         **kwargs):
+    """
+    Compare fields of **test_resource** to those of each of **ref_resources**,
+    each test field being read once for all.
+
+    :param fids: for each ref resource, the list of fields to compare (present in both)
+    :param fatal_exceptions: Raise comparing errors.
+    :param raw_precheck: report fields which raw records are identical as
+        bit-repro, without decoding them (cf. :class:`RawRecords`)
+    :param raw_identical: for each ref resource, the fields found identical by
+        their raw records (cf. :func:`_raw_identical`), if already known:
+        the raw records are then not scanned again
+    :param ref_indexes: for each ref resource, its :class:`FieldsIndex` (or None)
+    :param test_fingerprints: fingerprints of test fields (cf. :meth:`FieldsIndex.fingerprint`)
+        already computed, by field identifier (as str), to be matched with **ref_indexes**
+        without reading test fields
+    :param kwargs: passed to :func:`compare_2_fields`
+    :return: for each ref resource, the list of (fid, status, compared)
+        and the maximum normalized difference
+    """
+    if ref_indexes is None:
+        ref_indexes = [None for _ in ref_resources]
+    if test_fingerprints is None:
+        test_fingerprints = {}
+    ignore_meta = kwargs.get('ignore_meta', False)
+    if raw_identical is None:
+        if raw_precheck:
+            raw_identical = _raw_identical(test_resource, ref_resources, fids)
+        else:
+            raw_identical = [None for _ in ref_resources]
+    to_compare = [set([str(f) for f in ref_fids]) for ref_fids in fids]
+    meta_diffs = [MetaDiffs() for _ in ref_resources]
+    statuses = [[] for _ in ref_resources]
+    max_normalized_diff = [0. for _ in ref_resources]
+    for f in _union(fids):
+        test_field = None
+        for i, ref_resource in enumerate(ref_resources):
+            if str(f) not in to_compare[i]:
+                continue
+            if raw_identical[i] is not None and str(f) in raw_identical[i]:
+                statuses[i].append((f, bit_repro_status(not ignore_meta), True))
+                continue
+            fingerprint = test_fingerprints.get(str(f))
+            ref_entry = ref_indexes[i].get(f) if ref_indexes[i] is not None else None
+            if (fingerprint is not None and ref_entry is not None and
+                    FieldsIndex.matches(ref_entry, fingerprint, ignore_meta)):
+                with_meta = not ignore_meta and fingerprint['geometry'] is not None
+                statuses[i].append((f, bit_repro_status(with_meta), True))
+                continue
+            try:
+                if test_field is None:
+                    test_field = read_field(test_resource, f)
+                status, max_normalized_diff[i] = compare_2_fields(test_resource, ref_resource, f,
+                                                                  max_normalized_diff[i],
+                                                                  ref_index=ref_indexes[i],
+                                                                  test_field=test_field,
+                                                                  meta_diffs=meta_diffs[i],
+                                                                  **kwargs)
+                compared = True
+            except ExpertTimeout:
+                raise
+            except Exception as e:
+                if fatal_exceptions:
+                    raise
+                status = {'Error during comparison':str(e)}
+                compared = False
+            statuses[i].append((f, status, compared))
+    return list(zip(statuses, max_normalized_diff))
+
+
+def _compare_fields_in_files(test, refs, fids, ref_indexes=None, **kwargs):
+    """
+    Open **test** and **refs** resources, and compare fields **fids** (cf. :func:`compare_fields_multi`).
+
+    :return: results, and **ref_indexes** as updated
+    """
+    epygram = init_epygram()
+    t = epygram.formats.resource(test, 'r')
+    rs = [epygram.formats.resource(ref, 'r') for ref in refs]
+    try:
+        return compare_fields_multi(t, rs, fids, ref_indexes=ref_indexes, **kwargs), ref_indexes
+    finally:
+        for resource in [t] + rs:
+            resource.close()
+
+
+class RawRecords(object):
+    """
+    Digests of the raw (encoded) records of the fields of a resource, for fields
+    to be found identical without being decoded.
+
+    Covered formats are those which records embed all the metadata of their
+    fields, apart from file-level metadata (:meth:`header_digest`):
+    FA (articles, the frame and date being in header articles) and GRIB (messages).
+    """
+
+    formats = ('FA', 'GRIB')
+    #: Number of FA header articles (frame and date), at the beginning of the file
+    _FA_HEADER_LENGTH = 7
+    #: Additional FA header article (date, with seconds)
+    _FA_DATX = 'DATX-DES-DONNEES'
+
+    def __init__(self, resource):
+        self.resource = resource
+        self._digests = {}
+        if resource.format == 'GRIB':
+            self._grib_digests = self._scan_grib()
+
+    @classmethod
+    def of(cls, resource):
+        """The :class:`RawRecords` of **resource**, or None if its format is not covered."""
+        if getattr(resource, 'format', None) not in cls.formats:
+            return None
+        try:
+            return cls(resource)
+        except Exception as e:
+            logger.warning('Raw records of {} not available: {}'.format(resource.container.abspath, e))
+            return None
+
+    def header_digest(self):
+        """Digest of the file-level metadata records."""
+        if self.resource.format == 'FA':
+            names = [n.strip() for n in self._fa_names()]
+            header = names[:self._FA_HEADER_LENGTH]
+            if self._FA_DATX in names[self._FA_HEADER_LENGTH:]:
+                header.append(self._FA_DATX)
+            h = hashlib.sha1()
+            for name in header:
+                h.update(name.encode())
+                h.update(self._fa_record(name))
+            return h.digest()
+        else:
+            return b''
+
+    def digest(self, fid):
+        """Digest of the raw record of field **fid**, or None if not available."""
+        key = str(fid)
+        if key not in self._digests:
+            if self.resource.format == 'FA':
+                self._digests[key] = hashlib.sha1(self._fa_record(fid)).digest()
+            else:
+                self._digests[key] = self._grib_digests.get(key)
+        return self._digests[key]
+
+    def _fa_names(self):
+        from falfilfa4py import LFI as LFI4py
+        self._open()
+        unit = self.resource._unit
+        n = LFI4py.wlfinaf(unit)[0]
+        LFI4py.wlfipos(unit)  # rewind
+        return [LFI4py.wlficas(unit, True)[0] for _ in range(n)]
+
+    def _fa_record(self, name):
+        from falfilfa4py import LFI as LFI4py
+        self._open()
+        unit = self.resource._unit
+        length = LFI4py.wlfinfo(unit, name)[0]
+        return LFI4py.wlfilec(unit, name, length, True).tobytes()
+
+    def _open(self):
+        if not self.resource.isopen:
+            self.resource.open()
+
+    def _scan_grib(self):
+        """Digests of the GRIB messages, by field identifier (as listed by the resource)."""
+        import mmap
+        digests = []
+        with open(self.resource.container.abspath, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                start = m.find(b'GRIB')
+                while start >= 0:
+                    edition = m[start + 7]
+                    if edition == 1:
+                        length = int.from_bytes(m[start + 4:start + 7], 'big')
+                    elif edition == 2:
+                        length = int.from_bytes(m[start + 8:start + 16], 'big')
+                    else:
+                        raise ValueError('unknown GRIB edition: {}'.format(edition))
+                    if m[start + length - 4:start + length] != b'7777':
+                        raise ValueError('unexpected end of GRIB message at offset {}'.format(start))
+                    digests.append(hashlib.sha1(m[start:start + length]).digest())
+                    start = m.find(b'GRIB', start + length)
+        keys = [str(fid) for fid in self.resource.listfields()]
+        if len(keys) != len(digests):
+            raise ValueError('GRIB messages do not match the fields listed')
+        if len(set(keys)) != len(keys):
+            raise ValueError('fields are not uniquely identified')
+        return dict(zip(keys, digests))
+
+
+def _raw_identical(test_resource, ref_resources, fids):
+    """
+    For each of **ref_resources**, the set of fields (as str) among its **fids**
+    which have identical raw records in test and ref resources, or None if raw
+    records are not available or file-level metadata differ.
+    Raw records of **test_resource** are scanned once for all references.
+    """
+    test_raw = RawRecords.of(test_resource)
+    identical = []
+    for ref_resource, ref_fids in zip(ref_resources, fids):
+        ref_raw = None
+        if test_raw is not None and test_resource.format == getattr(ref_resource, 'format', None):
+            ref_raw = RawRecords.of(ref_resource)
+        if ref_raw is None or test_raw.header_digest() != ref_raw.header_digest():
+            identical.append(None)
+            continue
+        identical.append(set([str(f) for f in ref_fids
+                              if test_raw.digest(f) is not None and test_raw.digest(f) == ref_raw.digest(f)]))
+    return identical
+
+
+def bit_repro_status(with_meta=True):
+    """Status of a field found bit-repro without comparing decoded fields (cf. :func:`compare_2_fields`)."""
+    status = {'Validity diff':None, 'Geometry diff':None} if with_meta else {}
+    status['Data bit-repro'] = True
+    status['Validated'] = True
+    return status
+
+
+#: Number of batches of fields per worker, for the load to be balanced among workers
+_BATCHES_PER_WORKER = 4
+
+
+def _compare_fields_concurrently(test, refs, fids, workers, ref_indexes=None, **kwargs):
+    """
+    Compare fields **fids** (for each of **refs**) of files **test** and **refs**,
+    split in batches among a pool of **workers** processes.
+    Results are merged in the order of **fids** (cf. :func:`compare_fields_multi`).
+    """
+    import concurrent.futures
+    union = _union(fids)
+    batch_size = -(-len(union) // (workers * _BATCHES_PER_WORKER))
+    to_compare = [set([str(f) for f in ref_fids]) for ref_fids in fids]
+    batches = []
+    for i in range(0, len(union), batch_size):
+        batch = set([str(f) for f in union[i:i + batch_size]])
+        batches.append([[f for f in ref_fids if str(f) in batch] for ref_fids in fids])
+    statuses = [[] for _ in refs]
+    max_normalized_diff = [0. for _ in refs]
+    done = 0
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    futures = []
+    try:
+        futures = [executor.submit(_compare_fields_in_files, test, refs, batch,
+                                   ref_indexes=ref_indexes, **kwargs)
+                   for batch in batches]
+        for future in futures:  # in order
+            batch_results, batch_indexes = future.result()
+            for i, (batch_statuses, batch_max) in enumerate(batch_results):
+                statuses[i].extend(batch_statuses)
+                max_normalized_diff[i] = max(max_normalized_diff[i], batch_max)
+                if batch_indexes is not None:  # entries added by the worker
+                    ref_indexes[i].update(batch_indexes[i])
+            done += 1
+    finally:
+        # do not wait for remaining batches if interrupted (error, timeout)
+        shutdown_executor(executor, wait=done == len(batches), futures=futures)
+    return list(zip(statuses, max_normalized_diff))
+
+
 def compare_2_fields(test_resource, ref_resource, fid,
                      max_normalized_diff=0.,
                      ignore_meta=False,
                      validate_if_bit_repro_only=True,
-                     normalized_validation_threshold=NORMALIZED_FIELDS_DIFF):
+                     normalized_validation_threshold=NORMALIZED_FIELDS_DIFF,
+                     memory_budget=None,
+                     ref_index=None,
+                     test_field=None,
+                     meta_diffs=None):
     """
     Compare two same fields from different resources.
 
@@ -380,47 +1175,57 @@ def compare_2_fields(test_resource, ref_resource, fid,
     :param ignore_meta: Ignore metadata in comparison.
     :param validate_if_bit_repro_only: If True, Validated == Bit-repro; else, use normalized_validation_threshold.
     :param normalized_validation_threshold: Threshold on normalized distance for validation.
+    :param memory_budget: memory (Mb) allowed for the temporaries of the data
+        comparison, computed by chunks (cf. :func:`chunked_normalized_comparison`)
+    :param ref_index: a :class:`FieldsIndex` of **ref_resource**: if the test field
+        matches its entry, the ref field is not read; else the entry is added
+    :param test_field: the test field, if already read (by :func:`read_field`)
+    :param meta_diffs: a :class:`MetaDiffs` memo, shared by the fields of the same resources
     """
     import epygram
-    from epygram.formats.DDHLFA import DDHLFA
     status = {}
     validated = True
-    tfld = test_resource.readfield(fid)
-    rfld = ref_resource.readfield(fid)
-    if not isinstance(tfld, epygram.fields.MiscField):
-        if isinstance(ref_resource, DDHLFA):
-            # fields in DDHLFA are gathered as FieldSet, one per DDH domain; here we gather them into one field, using
-            # temporal dimension for that matter
-            tfld0 = tfld[0]
-            for f in tfld[1:]:
-                tfld0.extend(f)
-            tfld = tfld0
-            rfld0 = rfld[0]
-            for f in rfld[1:]:
-                rfld0.extend(f)
-            rfld = rfld0
-        for fld in (tfld, rfld):  # would not be sure of the meaning of errors in spectral space
-            if fld.spectral:
-                fld.sp2gp()
+    tfld = read_field(test_resource, fid) if test_field is None else test_field
+    misc = isinstance(tfld, epygram.fields.MiscField)
+    ref_entry = None
+    if ref_index is not None:
+        ref_entry = ref_index.get(fid)
+        if ref_entry is not None and FieldsIndex.matches(ref_entry, FieldsIndex.fingerprint(tfld), ignore_meta):
+            return bit_repro_status(not (misc or ignore_meta)), max_normalized_diff
+    rfld = read_field(ref_resource, fid)
+    if ref_index is not None and ref_entry is None:
+        ref_entry = ref_index.add(fid, rfld, memory_budget)
     # metadata
-    if not isinstance(tfld, epygram.fields.MiscField) and not ignore_meta:
-        status['Validity diff'] = tfld.validity.recursive_diff(rfld.validity)
-        status['Geometry diff'] = tfld.geometry.recursive_diff(rfld.geometry)
+    if not misc and not ignore_meta:
+        if meta_diffs is None:
+            meta_diffs = MetaDiffs()
+        status['Validity diff'] = meta_diffs.diff(tfld.validity, rfld.validity)
+        status['Geometry diff'] = meta_diffs.diff(tfld.geometry, rfld.geometry)
         if any([status.get('Validity diff', None),
                 status.get('Geometry diff', None)]):
             validated = False
     # data
+    numeric = (numpy.issubdtype(tfld.data.dtype, numpy.number) and
+               numpy.issubdtype(rfld.data.dtype, numpy.number))
     if tfld.data.shape != rfld.data.shape:
         status['Normalized data diff'] = 'Comparison not possible: dimensions differ'
         validated = False
         status['Data bit-repro'] = False
     else:
-        if isinstance(tfld.data.dtype, (int, float)):
-            status['Data bit-repro'] = bool(numpy.all(tfld.data - rfld.data <= EPSILON))
+        if numeric:
+            # only keep data, and release fields (and their geometry) right away
+            tdata, rdata = tfld.data, rfld.data
+            del tfld, rfld
+            status['Data bit-repro'] = data_equal(tdata, rdata)
         else:
-            status['Data bit-repro'] = bool(numpy.all(tfld.data == rfld.data))
+            status['Data bit-repro'] = data_equal(tfld.data, rfld.data)
         if not status['Data bit-repro']:
-            data_diff, common_mask = tfld.normalized_comparison(rfld)
+            if numeric:
+                ref_extrema = None if ref_entry is None else (ref_entry['min'], ref_entry['max'])
+                data_diff, common_mask = chunked_normalized_comparison(tdata, rdata, memory_budget,
+                                                                       ref_extrema=ref_extrema)
+            else:
+                data_diff, common_mask = tfld.normalized_comparison(rfld)
             status['Normalized data diff'] = data_diff
             status['Mask is common'] = common_mask
             if not common_mask:
@@ -440,6 +1245,485 @@ def compare_2_fields(test_resource, ref_resource, fid,
     return status, max_normalized_diff
 
 
+class MetaDiffs(object):
+    """
+    Memo of the differences between test and ref fields metadata (geometry,
+    validity), by fingerprints of both: the fields of a file usually share a
+    handful of geometries and one validity, which deep recursive comparisons
+    are thus computed once.
+
+    Fingerprints are digests of the pickled metadata, much cheaper to compute
+    than recursive differences for geometries.
+    """
+
+    def __init__(self):
+        self._diffs = {}
+
+    def diff(self, test_meta, ref_meta):
+        """Differences of **test_meta** to **ref_meta**, as their :meth:`recursive_diff`."""
+        try:
+            key = (self._fingerprint(test_meta), self._fingerprint(ref_meta))
+        except Exception:  # not picklable: not memoized
+            return test_meta.recursive_diff(ref_meta)
+        if key not in self._diffs:
+            self._diffs[key] = test_meta.recursive_diff(ref_meta)
+        return self._diffs[key]
+
+    @staticmethod
+    def _fingerprint(meta):
+        import pickle
+        return hashlib.sha1(pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL)).digest()
+
+    def __len__(self):
+        return len(self._diffs)
+
+
+def read_field(resource, fid):
+    """
+    Read field **fid** from **resource**, as to be compared: DDH fields are
+    gathered into one field, spectral fields are converted to gridpoint space.
+    """
+    import epygram
+    from epygram.formats.DDHLFA import DDHLFA
+    fld = resource.readfield(fid)
+    if not isinstance(fld, epygram.fields.MiscField):
+        if isinstance(resource, DDHLFA):
+            # fields in DDHLFA are gathered as FieldSet, one per DDH domain; here we gather them into one field, using
+            # temporal dimension for that matter
+            fld0 = fld[0]
+            for f in fld[1:]:
+                fld0.extend(f)
+            fld = fld0
+        if fld.spectral:  # would not be sure of the meaning of errors in spectral space
+            fld.sp2gp()
+    return fld
+
+
+class FieldsIndex(object):
+    """
+    Sidecar index of the fields of a (reference) file, stored next to it
+    (or its actual target, if a link) as JSON, for its fields not to be read again
+    when compared to identical fields.
+
+    For each field: shape, data type, digests of data and mask,
+    extrema (for normalization) and fingerprints of validity and geometry,
+    all as read by :func:`read_field`.
+
+    The index is invalid if its :attr:`version` is not current, or if the file
+    content has changed (checked with its size and modification time, then
+    its digest if they differ, e.g. for a copy).
+    """
+
+    #: Version of the index format and contents
+    version = 2
+    #: Suffix of the index filename, to the file's
+    suffix = '.fields_index.json'
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.path = os.path.realpath(filename) + self.suffix
+        self.fields = {}
+        self._digest = None
+        self._modified = False
+        self._load()
+
+    def _stat(self):
+        st = os.stat(self.filename)
+        return [st.st_size, st.st_mtime_ns]
+
+    def _file_digest(self):
+        if self._digest is None:
+            h = hashlib.sha256()
+            with io.open(self.filename, 'rb') as _file:
+                for block in iter(lambda: _file.read(2 ** 20), b''):
+                    h.update(block)
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def _load(self):
+        import json
+        try:
+            with io.open(self.path, 'r') as _index:
+                index = json.load(_index)
+        except (OSError, ValueError):  # absent or corrupted
+            return
+        if index.get('version') != self.version:
+            return
+        if index.get('stat') != self._stat():
+            if index.get('digest') != self._file_digest():
+                return
+            self._modified = True  # to be saved with the new stat
+        self._digest = index['digest']
+        self.fields = index['fields']
+
+    def save(self):
+        """Write the index (atomically), if modified; not being able to is not an error."""
+        import json
+        import tempfile
+        if not self._modified:
+            return
+        index = {'version':self.version,
+                 'stat':self._stat(),
+                 'digest':self._file_digest(),
+                 'fields':self.fields}
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            with io.open(fd, 'w') as _index:
+                json.dump(index, _index)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning('Fields index could not be saved to {}: {}'.format(self.path, e))
+        else:
+            self._modified = False
+
+    def get(self, fid):
+        """Entry of field **fid**, or None if not indexed."""
+        return self.fields.get(str(fid))
+
+    def add(self, fid, fld, memory_budget=None):
+        """Index field **fid** (as read in **fld**) and return its entry (None if its data is not numeric)."""
+        from epygram import config
+        entry = self.fingerprint(fld)
+        if entry is not None:
+            values, mask = _flat(fld.data)
+            extrema = _Moments()
+            for chunk in _chunks(fld.data, memory_budget):
+                v, valid = _valid(values, mask, chunk, config.mask_outside)
+                if valid.any():
+                    extrema.min = min(extrema.min, float(v[valid].min()))
+                    extrema.max = max(extrema.max, float(v[valid].max()))
+            entry['min'] = extrema.min
+            entry['max'] = extrema.max
+            self.fields[str(fid)] = entry
+            self._modified = True
+        return entry
+
+    def update(self, other):
+        """Add the entries of **other** index (of the same file) missing in this one."""
+        for k, entry in other.fields.items():
+            if k not in self.fields:
+                self.fields[k] = entry
+                self._modified = True
+
+    @classmethod
+    def fingerprint(cls, fld):
+        """Fingerprint of a field (as read by :func:`read_field`), or None if its data is not numeric."""
+        import epygram
+        data = fld.data
+        if not numpy.issubdtype(data.dtype, numpy.number):
+            return None
+        mask = numpy.ma.getmask(data)
+        misc = isinstance(fld, epygram.fields.MiscField)
+        return {'shape':list(data.shape),
+                'dtype':data.dtype.str,
+                'data':hashlib.sha1(numpy.ascontiguousarray(numpy.ma.filled(data, 0))).hexdigest(),
+                'mask':None if mask is numpy.ma.nomask else hashlib.sha1(numpy.ascontiguousarray(mask)).hexdigest(),
+                'validity':None if misc else cls._validity_fingerprint(fld.validity),
+                'geometry':None if misc else cls._meta_fingerprint(fld.geometry)}
+
+    @staticmethod
+    def _validity_fingerprint(validity):
+        """
+        Digest of each element of **validity**: basis, term, date/time, cumulative
+        duration and statistical process (the display of a validity being only its date/time).
+        """
+        elements = []
+        for v in validity:
+            basis, date_time = v.getbasis(), v.get()
+            term = None if basis is None or date_time is None else v.term()
+            elements.append([str(basis), str(term), str(date_time), str(v.cumulativeduration()),
+                             str(v.statistical_process_on_duration()), str(v.statistical_time_increment())])
+        return hashlib.sha1(str(elements).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _meta_fingerprint(meta):
+        """Digest of the full (no array summarization, exact floats) recursive display of **meta**."""
+        import sys
+        with numpy.printoptions(threshold=sys.maxsize, floatmode='unique'):
+            return hashlib.sha1(str(meta).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def matches(entry, fingerprint, ignore_meta=False):
+        """Whether the field of **fingerprint** is bit-repro to the indexed field **entry**."""
+        if fingerprint is None:
+            return False
+        keys = ['shape', 'dtype', 'data', 'mask']
+        if not ignore_meta:
+            keys.extend(['validity', 'geometry'])
+        return all([fingerprint[k] == entry[k] for k in keys])
+
+
+#: Number of values per block, in single-pass statistics and equality checks (for blocks to stay in cache)
+_STATS_BLOCK = 2 ** 16
+
+
+def field_stats(data, extended=False):
+    """
+    Statistics of field **data**, computed in a single pass by blocks:
+    min, avg, max (and std, number of NaN values if **extended**).
+    As with epygram fields' statistics, masked values and values outside of
+    +/- epygram's *mask_outside* are left out; so are NaN values.
+
+    :return: the statistics as a dict (empty if data is not numeric)
+    """
+    from epygram import config
+    if not numpy.issubdtype(data.dtype, numpy.number):
+        return {}
+    values, mask = _flat(data)
+    moments = _Moments()
+    nan = 0
+    for i in range(0, values.size, _STATS_BLOCK):
+        block = slice(i, i + _STATS_BLOCK)
+        v, valid = _valid(values, mask, block, config.mask_outside)
+        if extended and numpy.issubdtype(values.dtype, numpy.inexact):
+            nan += int(numpy.isnan(v).sum() if mask is None else (numpy.isnan(v) & ~mask[block]).sum())
+        moments.add(v[valid])
+    empty = moments.n == 0
+    stats = {'min':None if empty else moments.min,
+             'avg':None if empty else moments.mean,
+             'max':None if empty else moments.max}
+    if extended:
+        stats['std'] = None if empty else moments.std
+        stats['NaN'] = nan
+    return stats
+
+
+def compute_fields_stats(fields, extended=False, fingerprints=False, workers=1, resources=None):
+    """
+    Compute the statistics (cf. :func:`field_stats`) of **fields**, as a list
+    of (filename, fid), split in batches among a pool of **workers** processes.
+
+    :param fingerprints: also compute the fingerprints of the fields (cf.
+        :meth:`FieldsIndex.fingerprint`), when they are read as to be compared
+        (not spectral, not DDH)
+    :param resources: a :class:`~.caches.ResourcesCache` through which to open files,
+        if not split among processes
+    :return: the list of (stats, fingerprint or None), in the order of **fields**
+    """
+    if workers > 1 and len(fields) > 1:
+        import concurrent.futures
+        batch_size = -(-len(fields) // (workers * _BATCHES_PER_WORKER))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_fields_stats, fields[i:i + batch_size], extended, fingerprints)
+                       for i in range(0, len(fields), batch_size)]
+            return [r for future in futures for r in future.result()]
+    else:
+        return _fields_stats(fields, extended, fingerprints, resources)
+
+
+def _fields_stats(fields, extended, fingerprints, resources=None):
+    """Statistics (and fingerprints) of **fields** (cf. :func:`compute_fields_stats`)."""
+    from epygram.formats.DDHLFA import DDHLFA
+    own_resources = resources is None
+    if own_resources:
+        resources = ResourcesCache()
+    results = []
+    for filename, f in fields:
+        with resources.opened(filename) as r:
+            fld = r.readfield(f)
+            ddh = isinstance(r, DDHLFA)
+        data = getattr(fld, 'data', None)
+        stats = field_stats(data, extended) if isinstance(data, numpy.ndarray) else {}
+        fingerprint = None
+        if fingerprints and not ddh and not getattr(fld, 'spectral', False):
+            fingerprint = FieldsIndex.fingerprint(fld)
+        del fld, data
+        results.append((stats, fingerprint))
+    if own_resources:
+        resources.clear()
+    return results
+
+
+#: Number of float64 temporaries per data point, in chunked comparisons
+_CHUNK_TEMPORARIES = 8
+
+
+def _chunks(data, memory_budget=None):
+    """
+    Slices of the flattened **data**, for the temporaries of each chunk to fit
+    in **memory_budget** (Mb), or else to stay in cache (:data:`_STATS_BLOCK` values).
+    """
+    size = numpy.ma.getdata(data).size
+    if memory_budget is None:
+        chunk = _STATS_BLOCK
+    else:
+        chunk = max(int(memory_budget * 1024 ** 2) // (8 * _CHUNK_TEMPORARIES), 1)
+    return [slice(i, min(i + chunk, size)) for i in range(0, size, chunk)]
+
+
+def _flat(data):
+    """Flattened values of **data** (a view, if possible) and mask (or None)."""
+    mask = numpy.ma.getmask(data)
+    mask = None if mask is numpy.ma.nomask else mask.reshape(-1)
+    return numpy.ma.getdata(data).reshape(-1), mask
+
+
+def _valid(values, mask, chunk, mask_outside):
+    """Chunk of values (as float64) and where they are valid, i.e. not masked nor outside +/- **mask_outside**."""
+    values = values[chunk].astype(numpy.float64)
+    valid = (values >= -mask_outside) & (values <= mask_outside)
+    if mask is not None:
+        valid &= ~mask[chunk]
+    return values, valid
+
+
+def data_equal(test_data, ref_data, block=_STATS_BLOCK):
+    """
+    Whether data arrays are bit-reproducible: same shape, same masks (no mask
+    being the same as nothing masked) and same values where unmasked, NaN
+    values comparing equal to NaN values.
+
+    Checked by blocks of **block** values into preallocated buffers, hence
+    with no whole-array temporary, and stopping at the first differing block.
+    """
+    if numpy.shape(test_data) != numpy.shape(ref_data):
+        return False
+    tvalues, tmask = _flat(test_data)
+    rvalues, rmask = _flat(ref_data)
+    if not (numpy.issubdtype(tvalues.dtype, numpy.number) and
+            numpy.issubdtype(rvalues.dtype, numpy.number)):
+        return bool(numpy.all(test_data == ref_data))
+    nan = (numpy.issubdtype(tvalues.dtype, numpy.inexact) and
+           numpy.issubdtype(rvalues.dtype, numpy.inexact))
+    equal = numpy.empty(min(block, tvalues.size), dtype=bool)
+    if nan:
+        tnan = numpy.empty_like(equal)
+        rnan = numpy.empty_like(equal)
+    for i in range(0, tvalues.size, block):
+        b = slice(i, i + block)
+        n = min(block, tvalues.size - i)
+        eq = equal[:n]
+        # masks
+        mask = tmask[b] if tmask is not None else rmask[b] if rmask is not None else None
+        if tmask is not None and rmask is not None:
+            if not numpy.equal(tmask[b], rmask[b], out=eq).all():
+                return False
+        elif mask is not None and mask.any():
+            return False
+        # values
+        numpy.equal(tvalues[b], rvalues[b], out=eq)
+        if mask is not None:
+            numpy.logical_or(eq, mask, out=eq)
+        if eq.all():
+            continue
+        if nan:
+            tn = numpy.isnan(tvalues[b], out=tnan[:n])
+            numpy.logical_and(tn, numpy.isnan(rvalues[b], out=rnan[:n]), out=tn)
+            numpy.logical_or(eq, tn, out=eq)
+            if eq.all():
+                continue
+        return False
+    return True
+
+
+class _Moments(object):
+    """
+    Count, mean, second moment (float64), min and max of a distribution,
+    accumulated by chunks (Welford's online algorithm, chunks being merged
+    as by Chan et al.).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.min = numpy.inf
+        self.max = -numpy.inf
+
+    def add(self, values):
+        """Accumulate a chunk of **values** (Chan et al. pairwise update)."""
+        n = values.size
+        if n == 0:
+            return
+        mean = float(values.mean(dtype=numpy.float64))
+        m2 = float(((values - mean) ** 2).sum(dtype=numpy.float64))
+        delta = mean - self.mean
+        total = self.n + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.n * n / total
+        self.n = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def std(self):
+        return (self.m2 / self.n) ** 0.5 if self.n > 0 else 0.
+
+
+def _normalization(test, ref, epsilon):
+    """
+    (offset, scale) of the normalizations of test and ref data, from their
+    :class:`_Moments`, as in :meth:`epygram.base.Field.normalized_comparison`.
+    """
+    if abs(ref.max - ref.min) <= epsilon:  # ref is constant
+        if ref.min <= epsilon:
+            ref_norm = (0., 1.)
+            if abs(test.max - test.min) <= epsilon:  # test is also constant
+                test_norm = (0., 1.) if test.min <= epsilon else (0., test.min)
+            else:  # ref is constant 0.: normalize test by itself
+                test_norm = (test.min, test.max - test.min)
+        else:
+            ref_norm = test_norm = (0., ref.min)
+    else:
+        ref_norm = test_norm = (ref.min, ref.max - ref.min)
+    return test_norm, ref_norm
+
+
+def chunked_normalized_comparison(test_data, ref_data, memory_budget=None, ref_extrema=None):
+    """
+    Normalized comparison of test to ref data, as
+    :meth:`epygram.base.Field.normalized_comparison`, but computed by chunks
+    (cf. :func:`_chunks`) with float64 streaming accumulators (:class:`_Moments`),
+    instead of whole-array temporaries (normalized test and ref, difference).
+    Peak memory is thus close to that of the input data.
+
+    Statistics apply to the data commonly unmasked (and within +/- epygram's
+    *mask_outside*). As in epygram (whose comparison checks the mask of test
+    against itself), *common_mask* is always True, for validations not to change.
+
+    :param ref_extrema: (min, max) of ref data, if known (e.g. from a :class:`FieldsIndex`)
+    :return ({bias, std, errmax}, common_mask)
+    """
+    from epygram import config
+    tvalues, tmask = _flat(test_data)
+    rvalues, rmask = _flat(ref_data)
+    chunks = _chunks(test_data, memory_budget)
+    # pass 1: extrema, for normalization
+    test, ref = _Moments(), _Moments()
+    if ref_extrema is not None:
+        ref.min, ref.max = ref_extrema
+    common_mask = True
+    for chunk in chunks:
+        t, tvalid = _valid(tvalues, tmask, chunk, config.mask_outside)
+        r, rvalid = _valid(rvalues, rmask, chunk, config.mask_outside)
+        if tvalid.any():
+            test.min = min(test.min, float(t[tvalid].min()))
+            test.max = max(test.max, float(t[tvalid].max()))
+        if ref_extrema is None and rvalid.any():
+            ref.min = min(ref.min, float(r[rvalid].min()))
+            ref.max = max(ref.max, float(r[rvalid].max()))
+    (toffset, tscale), (roffset, rscale) = _normalization(test, ref, config.epsilon)
+    # pass 2: distribution of normalized differences
+    diff = _Moments()
+    for chunk in chunks:
+        t, tvalid = _valid(tvalues, tmask, chunk, config.mask_outside)
+        r, rvalid = _valid(rvalues, rmask, chunk, config.mask_outside)
+        t -= toffset
+        t /= tscale
+        r -= roffset
+        r /= rscale
+        t -= r
+        del r
+        valid = tvalid & rvalid & (t >= -config.mask_outside) & (t <= config.mask_outside)
+        diff.add(t[valid])
+    if diff.n == 0:
+        return {'bias':0., 'std':0., 'errmax':0.}, common_mask
+    return ({'bias':diff.mean,
+             'std':diff.std,
+             'errmax':max(abs(diff.min), abs(diff.max))},
+            common_mask)
+
+
 def ignore_field(fid):
     """Test if field is to be ignored in comparison."""
     ignore = False
@@ -488,17 +1772,46 @@ class FieldComparer(Worker):
                 optional=True,
                 default=True
             ),
+            memory_budget=dict(
+                type=float,
+                optional=True,
+                default=None
+            ),
+            validate_if_bit_repro_only=dict(
+                type=bool,
+                optional=True,
+                default=True
+            ),
+            fields_workers=dict(
+                type=int,
+                optional=True,
+                default=1
+            ),
+            raw_precheck=dict(
+                type=bool,
+                optional=True,
+                default=True
+            ),
+            reference_index=dict(
+                type=bool,
+                optional=True,
+                default=False
+            ),
         )
     )
 
     def _task(self):
-        return (self.test,
-                compare_2_files(self.test, self.ref,
-                               ignore_meta=self.ignore_meta,
-                               ignore_orphan_fields=self.ignore_orphan_fields,
-                               hide_bit_repro_fields=self.hide_bit_repro_fields,
-                               normalized_validation_threshold=self.normalized_validation_threshold,
-                               fatal_exceptions=self.fatal_exceptions))
+        return _timed_comparison(self.test, self.ref,
+                                 ignore_meta=self.ignore_meta,
+                                 ignore_orphan_fields=self.ignore_orphan_fields,
+                                 hide_bit_repro_fields=self.hide_bit_repro_fields,
+                                 validate_if_bit_repro_only=self.validate_if_bit_repro_only,
+                                 normalized_validation_threshold=self.normalized_validation_threshold,
+                                 fatal_exceptions=self.fatal_exceptions,
+                                 memory_budget=self.memory_budget,
+                                 fields_workers=self.fields_workers,
+                                 raw_precheck=self.raw_precheck,
+                                 reference_index=self.reference_index)
 
 
 def scatter_fields_process_summary(report_file, all_in_one=False):
@@ -511,7 +1824,7 @@ def scatter_fields_process_summary(report_file, all_in_one=False):
     import json
     from bokeh.io import save, output_file  # @UnresolvedImport
     from bokeh.layouts import column  # @UnresolvedImport
-    with open(report_file, 'r') as f:
+    with open_summary(report_file) as f:
         report = json.load(f)
     report = report['fields_in_file']
     if all_in_one:
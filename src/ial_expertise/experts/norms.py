@@ -2,8 +2,6 @@
 # -*- coding: utf-8 -*-
 """Norms parsers."""
 
-import arpifs_listings
-
 from . import OutputExpert
 from .thresholds import NORMSDIGITS_BITREPRO
 
@@ -57,11 +55,11 @@ class NormsChecker(OutputExpert):
 
     def _parse(self):
         """Parse file, read all norms."""
-        self.listing = arpifs_listings.listings.OutputListing(self.output, 'norms')
-        self.listing.parse_patterns(flush_after_reading=True)
+        import arpifs_listings
+        self.normset = arpifs_listings.norms.NormsSet(self._read_listing(self.output))
 
     def summary(self):
-        normset = [n.as_dict() for n in self.listing.normset.norms_at_each_step]
+        normset = [n.as_dict() for n in self.normset.norms_at_each_step]
         summary = {'Number of steps':len(normset)}
         if self.normstype in ('spnorms', 'gpnorms'):
             normset = [{'step':n['step'], self.normstype:n[self.normstype]}
@@ -92,6 +90,7 @@ class NormsChecker(OutputExpert):
         :param validation_threshold: validation will be considered OK if the
             maximal number of different digits is lower or equal to threshold
         """
+        import arpifs_listings
         if mode in ('last', 'last_spectral'):
             teststeps = [test[cls._modes[mode]],]
             refsteps = [ref[cls._modes[mode]],]
@@ -117,6 +116,7 @@ class NormsChecker(OutputExpert):
         :param validation_threshold: validation will be considered OK if the
             maximal number of different digits is lower or equal to threshold
         """
+        import arpifs_listings
         worst_digit = arpifs_listings.norms.compare_normsets(testset, refset, mode='get_worst',
                                                              which='all',
                                                              onlymaxdiff=True)
@@ -144,12 +144,12 @@ class NormsChecker(OutputExpert):
     def _compare_listings(self, references,
                           validation_threshold=NORMSDIGITS_BITREPRO):
         """Get listing among references resources, parse it and compare."""
+        import arpifs_listings
         ref_listing = self.filter_one_resource(references, rkind='plisting')
-        ref_listing_in = arpifs_listings.listings.OutputListing(
-            ref_listing.container.localpath(), 'norms')
-        ref_listing_in.parse_patterns(flush_after_reading=True)
-        return self._compare_2normsets(self.listing.normset,
-                                       ref_listing_in.normset,
+        ref_normset = arpifs_listings.norms.NormsSet(
+            self._read_listing(ref_listing.container.localpath()))
+        return self._compare_2normsets(self.normset,
+                                       ref_normset,
                                        hide_equal_norms=self.hide_equal_norms,
                                        validation_threshold=validation_threshold)
 
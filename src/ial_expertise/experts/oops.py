@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """OOPS parsers."""
 import re
-import numpy
+import math
 
 from . import TextOutputExpert, ExpertError
 from .util import ppp, ppi, FLOAT_RE, EXTENDED_FLOAT_RE
@@ -231,10 +231,10 @@ class OOPSJoTLExpert(OOPSTestExpert):
         updates = sorted(set(test.keys()).intersection(set(ref.keys())))
         keys = sorted(set(test[updates[0]].keys()).intersection(set(ref[updates[0]].keys())))
         errors = {u:{k:test[u][k] - ref[u][k]
-                     for k in keys if not numpy.isinf(ref[u][k])}
+                     for k in keys if not math.isinf(ref[u][k])}
                   for u in updates}
         rel_errors = {u:{k:errors[u][k] / ref[u][k]
-                         for k in keys if not numpy.isinf(ref[u][k])}
+                         for k in keys if not math.isinf(ref[u][k])}
                       for u in updates}
         max_rel_err = max([max(update.values())
                            for update in rel_errors.values()
@@ -38,6 +38,10 @@ class DrHook(OutputExpert):
     _re_openmp_threads = re.compile(r'Number of OpenMP-threads : (?P<openmp>\d+)')
     _header = "  Avg-%   Avg.time   Min.time   Max.time   St.dev  Imbal-%   # of calls : Name of the routine"
 
+    def input_files(self):
+        self._find_drhookprof()
+        return self.drhookfiles
+
     def _parse(self):
         """Actual parsing."""
         self._find_drhookprof()
@@ -209,6 +213,10 @@ class RSS(OutputExpert):
     _re_file2 = re.compile(r'listing\..+\.stdeo\.(?P<n>\d+)')
     _re_rss = re.compile(r'.*RSS=(\d+)k$')
 
+    def input_files(self):
+        self._find_stdeos()
+        return self.stdeos
+
     def _parse(self):
         """Actual parsing."""
         self._find_stdeos()
@@ -363,6 +371,9 @@ class ParallelBatorProfile(OutputExpert):
 
     side_expert = True
 
+    def input_files(self):
+        return [self.synthesis]
+
     def _parse(self):
         """Actual parsing."""
         with open(self.synthesis, 'r') as f:
@@ -3,6 +3,15 @@
 """
 Useful functionalities for Experts.
 """
+import contextlib
+import io
+import os
+import sys
+import threading
+
+from bronx.fancies import loggers
+
+logger = loggers.getLogger(__name__)
 
 FLOAT_RE = r'(\d+\*)*(\+|\-)*((\d+(\.\d*)*)|(\.\d+))((E|e)(\+|\-)\d+)*'
 NAN_RE = '(NaN)|(nan)|(NAN)'
@@ -11,6 +20,177 @@ EXTENDED_FLOAT_RE = '({})'.format('|'.join(['({})'.format(expr)
                                             for expr in (FLOAT_RE,
                                                          NAN_RE,
                                                          INFINITY_RE)]))
+#: Magic number at the beginning of gzip-compressed files
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+_epygram_env_initialized = False
+
+
+def init_epygram():
+    """Import epygram and initialize its environment, once per process; return the module."""
+    global _epygram_env_initialized
+    import epygram
+    if not _epygram_env_initialized:
+        epygram.init_env()
+        _epygram_env_initialized = True
+    return epygram
+
+
+def open_summary(filename):
+    """Open a (JSON) summary file for reading, be it gzip-compressed or not."""
+    with io.open(filename, 'rb') as f:
+        compressed = f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    if compressed:
+        import gzip
+        return gzip.open(filename, 'rt')
+    else:
+        return io.open(filename, 'r')
+
+
+def identical_files(filename1, filename2, chunk_size=2 ** 20):
+    """
+    Whether two files have identical contents:
+    compare sizes first, then contents by chunks of **chunk_size** bytes.
+    """
+    if os.path.samefile(filename1, filename2):
+        return True
+    if os.path.getsize(filename1) != os.path.getsize(filename2):
+        return False
+    with io.open(filename1, 'rb') as f1, io.open(filename2, 'rb') as f2:
+        while True:
+            chunk = f1.read(chunk_size)
+            if chunk != f2.read(chunk_size):
+                return False
+            if not chunk:
+                return True
+
+
+def warm_file(filename, chunk_size=2 ** 20):
+    """
+    Warm the page cache with the contents of **filename**: advise the kernel
+    it will be needed (if available), then read it through by chunks of
+    **chunk_size** bytes into a single buffer (some filesystems ignore advice).
+    """
+    buffer = bytearray(chunk_size)
+    with io.open(filename, 'rb', buffering=0) as f:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        while f.readinto(buffer):
+            pass
+
+
+#: Measures reported by experts, collected by thread (cf. :func:`collected_measures`)
+_reported_measures = threading.local()
+
+
+@contextlib.contextmanager
+def collected_measures():
+    """
+    Collect the measures reported (cf. :func:`report_measure`) by experts within
+    the context, in the current thread, as a dict of lists of values by name.
+    """
+    collected = {}
+    previous = getattr(_reported_measures, 'collected', None)
+    _reported_measures.collected = collected
+    try:
+        yield collected
+    finally:
+        _reported_measures.collected = previous
+
+
+def report_measure(name, value):
+    """Report a measure of the current expert step, for profiling (ignored if not collected)."""
+    collected = getattr(_reported_measures, 'collected', None)
+    if collected is not None:
+        collected.setdefault(name, []).append(value)
+
+
+def shutdown_executor(executor, wait=True, futures=()):
+    """
+    Shut **executor** (of :mod:`concurrent.futures`) down, cancelling its pending
+    jobs: **futures** are cancelled one by one, the others only from Python 3.9
+    on (``cancel_futures``); before, they still run.
+    """
+    for future in futures:
+        future.cancel()
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=wait, cancel_futures=True)
+    else:
+        executor.shutdown(wait=wait)
+
+
+class ReadAhead(object):
+    """
+    Iterate over **items** (e.g. pairs of files to be compared), while the
+    files of the next **depth** items are read ahead (cf. :func:`warm_file`)
+    in a background thread: I/O of upcoming files overlaps processing of the
+    current ones, memory being only that of the page cache.
+
+    Usage::
+
+        with ReadAhead(pairs, depth=2) as pairs:
+            for test, ref in pairs:
+                compare(test, ref)
+
+    :param files: function returning the filenames of an item
+        (default: the item is an iterable of filenames)
+    """
+
+    def __init__(self, items, depth=1, files=None):
+        self.items = list(items)
+        self.depth = depth
+        self.files = files if files is not None else list
+        self._current = 0  # index of the item being processed (first one right away)
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = None
+        self.warmed = []  # files read ahead, in order
+
+    def __enter__(self):
+        if self.depth > 0 and len(self.items) > 1:
+            self._thread = threading.Thread(target=self._read_ahead, name='read_ahead', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __iter__(self):
+        for i, item in enumerate(self.items):
+            with self._condition:
+                self._current = i
+                self._condition.notify_all()
+            yield item
+
+    def _read_ahead(self):
+        """Read files of upcoming items, as long as they are within **depth** of the current one."""
+        done = set()
+        for i, item in enumerate(self.items):
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or i <= self._current + self.depth)
+                if self._closed:
+                    return
+                if i <= self._current:  # already being processed (hence read): too late
+                    done.update(self.files(item))
+                    continue
+            for filename in self.files(item):
+                if filename in done:
+                    continue
+                done.add(filename)
+                try:
+                    warm_file(filename)
+                except Exception as e:  # only an optimization
+                    logger.warning('Unable to read ahead {}: {}'.format(filename, e))
+                else:
+                    self.warmed.append(filename)
+                if self._closed:
+                    return
 
 
 def difftree(test, ref, fatal_exceptions=False):
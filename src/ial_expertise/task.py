@@ -3,14 +3,26 @@
 """
 Task: tools to analyse the outputs of a task and state about its validation.
 """
+import concurrent.futures
+import functools
+import gzip
+import io
 import json
+import os
+import re
+import signal
 import sys
+import tempfile
+import threading
+import time
 
 from footprints import proxy as fpx
 from bronx.fancies import loggers
 from bronx.stdtypes import date
 
-from .experts import ExpertError
+from .experts import ExpertError, ExpertTimeout, load_experts
+from .experts.caches import ListingsCache, ResultsCache, WorkersPools, reference_summaries
+from .experts.util import open_summary, collected_measures
 
 logger = loggers.getLogger(__name__)
 
@@ -54,79 +66,475 @@ class TaskSummary(dict):
     Experts.
 
     Each Expert is a key of the TaskSummary.
+
+    The serialization of each key is kept, for dumps to only re-serialize the
+    keys that have been set since last dump. Values must hence not be modified
+    in place: set the key again, or call :meth:`touch`.
     """
 
-    def __init__(self, from_file=None):
+    #: Available formats of dump: indented JSON, compact JSON, gzip-compressed compact JSON
+    formats = ('indented', 'compact', 'gzip')
+
+    def __init__(self, from_file=None, fmt='indented'):
+        if fmt not in self.formats:
+            raise ValueError("Unknown format: '{}', must be among {}".format(fmt, self.formats))
+        self.fmt = fmt
+        self._fragments = {}  # serialized (key, value), by key
+        self._dumped = None  # (file, format) of the last dump, if nothing changed since
         if from_file is not None:
             self._load(from_file)
 
+    def touch(self, key):
+        """Notify that the value of **key** has been modified in place."""
+        self._fragments.pop(key, None)
+        self._dumped = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.touch(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.touch(key)
+
+    def pop(self, key, *default):
+        self.touch(key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.touch(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        super().clear()
+        self._fragments.clear()
+        self._dumped = None
+
+    def __reduce__(self):
+        return (self.__class__, (None, self.fmt), None, None, iter(self.items()))
+
+    def _fragment(self, key):
+        """Serialization of a (key, value) item, as a member of the whole JSON object."""
+        if key not in self._fragments:
+            if self.fmt == 'indented':
+                value = json.dumps(self[key], indent=2, sort_keys=True).replace('\n', '\n  ')
+                self._fragments[key] = '  {}: {}'.format(json.dumps(key), value)
+            else:
+                value = json.dumps(self[key], sort_keys=True, separators=(',', ':'))
+                self._fragments[key] = '{}:{}'.format(json.dumps(key), value)
+        return self._fragments[key]
+
+    def dumps(self):
+        """Serialize the TaskSummary as JSON, re-serializing only the keys set since last time."""
+        fragments = [self._fragment(k) for k in sorted(self.keys())]
+        if self.fmt == 'indented':
+            return '{\n' + ',\n'.join(fragments) + '\n}' if fragments else '{}'
+        else:
+            return '{' + ','.join(fragments) + '}'
+
     def dump(self, out=sys.stdout):
-        """Dump the TaskSummary into a JSON file."""
+        """
+        Dump the TaskSummary into a JSON file (or stream).
+        Files are written atomically, and not re-written if nothing changed since last dump.
+        """
         if isinstance(out, str):
-            close = True
-            out = open(out, 'w')
+            if self._dumped == (os.path.abspath(out), self.fmt) and os.path.exists(out):
+                return
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out)),
+                                       prefix='.' + os.path.basename(out), suffix='.tmp')
+            try:
+                if self.fmt == 'gzip':
+                    with gzip.open(io.open(fd, 'wb'), 'wt') as f:
+                        f.write(self.dumps())
+                else:
+                    with io.open(fd, 'w') as f:
+                        f.write(self.dumps())
+                os.chmod(tmp, 0o666 & ~_umask())
+                os.replace(tmp, out)  # atomic: readers never see a truncated file
+            except BaseException:
+                os.remove(tmp)
+                raise
+            self._dumped = (os.path.abspath(out), self.fmt)
         else:
-            close = False
-        json.dump(self, out, indent=2, sort_keys=True)
-        if close:
-            out.close()
+            out.write(self.dumps())
 
     def _load(self, filein):
         if isinstance(filein, str):
-            close = True
-            filein = open(filein, 'r')
+            with open_summary(filein) as f:
+                asdict = json.load(f)
         else:
-            close = False
-        asdict = json.load(filein)
-        if close:
-            filein.close()
+            asdict = json.load(filein)
         self.clear()
         self.update(asdict)
 
 
+@functools.lru_cache(maxsize=None)
+def _umask():
+    """Umask of the process (read once: setting it back and forth is not thread-safe)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+#: Environment variable to activate the dump of a cProfile profile of each expert
+#: parsing/comparison: its value is the directory where to dump (current directory if not a directory)
+CPROFILE_ENV_VAR = 'IAL_EXPERTISE_CPROFILE'
+
+
+def _peak_rss():
+    """Peak RSS of the current process, in kb (or None if unavailable)."""
+    try:
+        import resource
+    except ImportError:  # not on POSIX systems
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measured(expert, step, method, *args):
+    """
+    Call **method** (of **expert**) with **args**, and measure the
+    wall time, CPU time (of the calling thread) and increase in peak memory.
+    If tracemalloc is tracing (e.g. with PYTHONTRACEMALLOC=1), the peak of
+    traced memory is measured too. Measures reported by the expert during the
+    call (cf. :func:`~.experts.util.report_measure`) are added.
+
+    :return: the result of the call, and the measures as a dict
+    """
+    import tracemalloc
+    profile = None
+    if os.environ.get(CPROFILE_ENV_VAR):
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:  # e.g. another profiler is active in a concurrent thread
+            logger.warning(f"Unable to profile expert {expert.kind} ({step}): {e}")
+            profile = None
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        traced0 = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):  # python >= 3.9
+            tracemalloc.reset_peak()
+    rss0 = _peak_rss()
+    wall0 = time.perf_counter()
+    cpu0 = time.thread_time()
+    try:
+        with collected_measures() as reported:
+            result = method(*args)
+    finally:
+        cpu = time.thread_time() - cpu0
+        wall = time.perf_counter() - wall0
+        if profile is not None:
+            profile.disable()
+            outdir = os.environ[CPROFILE_ENV_VAR]
+            if not os.path.isdir(outdir):
+                outdir = os.getcwd()
+            dumpname = re.sub(r'[^\w.+-]+', '_', f'expertise_cprofile.{expert.kind}.{step}').strip('_')
+            profile.dump_stats(os.path.join(outdir, dumpname + '.prof'))
+    measures = {'Wall time (s)':round(wall, 3),
+                'CPU time (s)':round(cpu, 3)}
+    if rss0 is not None:
+        measures['Peak RSS increase (Mb)'] = round((_peak_rss() - rss0) / 1024., 1)
+    if tracing:
+        measures['Traced memory peak (Mb)'] = round(
+            (tracemalloc.get_traced_memory()[1] - traced0) / 1024. / 1024., 1)
+    measures.update(reported)
+    return result, measures
+
+
+#: Lock for delayed parsings, to happen only once for experts shared by concurrent threads
+_delayed_parsing_lock = threading.Lock()
+
+
+def _can_interrupt():
+    """Whether a time-limited call can be interrupted (by SIGALRM: POSIX, main thread only)."""
+    return (hasattr(signal, 'setitimer') and
+            threading.current_thread() is threading.main_thread())
+
+
+def _time_limited(time_budget, method, *args):
+    """
+    Call **method** with **args**, interrupting it with an :class:`ExpertTimeout`
+    if it exceeds **time_budget** seconds. Calls cannot be interrupted out of
+    the main thread: they are then run without limit (cf. :meth:`ExpertBoard._result`).
+    """
+    if time_budget is None:
+        return method(*args)
+    if not _can_interrupt():
+        logger.warning("Time budget ({}s) not enforced: ".format(time_budget) +
+                       "calls can only be interrupted in the main thread, where signal.setitimer is available")
+        return method(*args)
+
+    def interrupt(signum, frame):
+        raise ExpertTimeout("Time budget exceeded ({}s)".format(time_budget))
+
+    handler = signal.signal(signal.SIGALRM, interrupt)
+    signal.setitimer(signal.ITIMER_REAL, time_budget)
+    try:
+        return method(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, handler)
+
+
+def _started(starts, job, function, *args):
+    """Record the start time of **job** into **starts**, then call **function** with **args**."""
+    starts[job] = time.monotonic()
+    return function(*args)
+
+
+def _cache_key(results_cache, expert, step, references=()):
+    """
+    Key of the result of an expert **step** in **results_cache**,
+    or None if no cache or the result cannot be identified.
+    """
+    if results_cache is None:
+        return None
+    try:
+        files = expert.input_files()
+        if files is None:
+            return None
+        files = list(files) + [r.container.localpath() for r in references]
+        return results_cache.key(expert, step, files)
+    except Exception as e:
+        logger.warning(f"Expert {expert.kind}: unable to identify {step} result in cache: {e}")
+        return None
+
+
+def _parse_with(expert, results_cache=None, time_budget=None):
+    """
+    Parse with **expert**, unless its summary is found in **results_cache**;
+    return the expert (possibly a copy), its summary and measures of the parsing.
+
+    If the parsing exceeds **time_budget**, it is interrupted and reported in summary.
+    """
+    key = _cache_key(results_cache, expert, 'parse')
+    summary = results_cache.get(key) if key else None
+    if summary is None:
+        try:
+            summary, measures = _measured(expert, 'parse', _time_limited, time_budget, expert.parse)
+        except ExpertTimeout as e:
+            logger.error(f"Expert {expert.kind}: parsing interrupted: {e}")
+            summary, measures = _timeout_summary('Parsing', e), {'Timeout (s)':time_budget}
+        else:
+            if key and 'Failed' not in (summary.get('Parsing'), summary.get('Summary')):
+                results_cache.put(key, summary)
+    else:
+        measures = {'From cache':True}
+    return expert, summary, measures
+
+
+def _compare_with(expert, references, results_cache=None, time_budget=None):
+    """
+    Compare with **expert** to each set of **references** (dict of lists of
+    reference resource handlers, by name of the set, e.g. 'consistency'),
+    unless the comparisons are found in **results_cache**;
+    return the comparisons (by name of the set) and their measures.
+
+    If the comparison (including a delayed parsing) exceeds **time_budget**,
+    it is interrupted and reported in comparisons.
+    """
+    step = 'compare ({})'.format(', '.join(references))
+    keys = {which:_cache_key(results_cache, expert, 'compare', refs)
+            for which, refs in references.items()}
+    comps = {which:results_cache.get(key) if key else None
+             for which, key in keys.items()}
+    if None in comps.values():
+        try:
+            comps, measures = _measured(expert, step, _time_limited, time_budget,
+                                        _delayed_parse_and_compare, expert, references)
+        except ExpertTimeout as e:
+            logger.error(f"Expert {expert.kind}: {step} interrupted: {e}")
+            comps = {which:_timeout_summary('Comparison', e) for which in references}
+            measures = {'Timeout (s)':time_budget}
+        else:
+            for which, comp in comps.items():
+                if keys[which] and comp.get('Comparison') != 'Failed':
+                    results_cache.put(keys[which], comp)
+    else:
+        measures = {'From cache':True}
+    return comps, measures
+
+
+def _delayed_parse_and_compare(expert, references):
+    """
+    Compare with **expert** to each set of **references**, parsing first if not
+    done yet (summary found in cache). Several sets are compared at once.
+    """
+    with _delayed_parsing_lock:
+        if not expert.parsed:  # summary has been found in cache, but comparison needs actual parsing
+            expert.parse()
+    if len(references) == 1:
+        [(which, refs)] = references.items()
+        return {which:expert.compare(refs)}
+    else:
+        return expert.compare_multi(references)
+
+
+def _timeout_summary(step, exception):
+    """Summary of a parsing/comparison **step** interrupted by a timeout."""
+    return {step:'Timeout',
+            'Exception':str(exception)}
+
+
 class ExpertBoard(object):
 
-    def __init__(self, experts, lead_expert=None):
+    #: Available concurrency modes, and associated executor class names in :mod:`concurrent.futures`
+    concurrency_modes = {'threads':'ThreadPoolExecutor',
+                         'processes':'ProcessPoolExecutor'}
+    #: Files to which summaries are dumped
+    summary_files = {'task_summary':'task_summary.json',
+                     'consistency':'task_consistency.json',
+                     'continuity':'task_continuity.json'}
+    #: Available modes of processing side experts, in fast verdict mode
+    fast_verdict_modes = ('after', 'background', 'skip')
+
+    def __init__(self, experts, lead_expert=None,
+                 concurrency=None,
+                 max_workers=None,
+                 results_cache=None,
+                 time_budget=None,
+                 fast_verdict=None,
+                 summary_format='indented'):
         """
         Arguments:
 
         :param experts: list of dicts, whose kwargs are used to get
             experts and parse output
         :param lead_expert: indicate whose Expert is to be selected from the experts panel for validation
+        :param concurrency: if not None, run the experts (and the consistency/continuity
+            comparisons) concurrently, using a pool of 'threads' or 'processes'.
+            With 'processes', experts and reference resource handlers must be picklable.
+        :param max_workers: maximum number of concurrent workers in the pool
+            (default: as in :mod:`concurrent.futures`)
+        :param results_cache: a :class:`~.experts.caches.ResultsCache` (or its directory),
+            to reuse the results of experts when their input files have not changed
+        :param time_budget: maximum time (s) allowed for each parsing/comparison
+            by experts that do not specify their own *time_budget*. An expert
+            exceeding its budget is interrupted and reported with a 'T' status;
+            other experts still run. With 'threads' concurrency, the expert
+            cannot actually be interrupted: it is abandoned in its thread.
+            So is it out of the main thread (e.g. side experts in 'background'),
+            experts with a budget being then processed in a pool of one thread.
+            This is a budget per expert (and per parsing/comparison), not a
+            limit to the overall wall time of the board.
+        :param fast_verdict: if not None, the validation (i.e. non-side) experts
+            are processed first and their verdict dumped right away; side experts
+            (profiling, setup...) are then processed according to this mode:
+            'after' the verdict, in the 'background' (cf. :meth:`wait`),
+            or 'skip'-ped.
+        :param summary_format: format of the summaries files, among
+            :attr:`TaskSummary.formats` ('gzip' files keep their .json name,
+            and are read transparently by :class:`TaskSummary`).
+            Summaries are dumped incrementally, as each expert finishes.
         """
         if isinstance(lead_expert, dict):
             lead_expert = lead_expert.get('kind', None)
         self.lead_expert = lead_expert
+        if concurrency is not None and concurrency not in self.concurrency_modes:
+            raise ExpertError("Unknown concurrency mode: '{}', must be among {}".format(
+                concurrency, sorted(self.concurrency_modes.keys())))
+        self.concurrency = concurrency
+        self.max_workers = max_workers
+        if fast_verdict is not None and fast_verdict not in self.fast_verdict_modes:
+            raise ExpertError("Unknown fast verdict mode: '{}', must be among {}".format(
+                fast_verdict, self.fast_verdict_modes))
+        self.fast_verdict = fast_verdict
+        self._side_thread = None  # processing side experts in background
+        if isinstance(results_cache, str):
+            results_cache = ResultsCache(results_cache)
+        self.results_cache = results_cache
+        self.time_budget = time_budget
+        self.timed_out = set()  # kinds of experts whose parsing exceeded their time budget
+        self._abandoned_jobs = False  # whether timed out jobs are still running in threads
+        self.listings_cache = ListingsCache()  # for each listing to be read only once, by all experts
+        self._time_budgets = {}  # experts' own, by kind (experts may be replaced by copies from other processes)
+        self.workers_pools = WorkersPools()  # for workers to be started only once, by all experts
         self.experts = list()
         for expert in experts:
             self.add_expert(expert)
-        self.task_summary = TaskSummary()  # to contain summaries reported by each expert
-        self.consistency = TaskSummary()  # contains consistency comparisons outputs
-        self.continuity = TaskSummary()  # contains continuity comparisons outputs
+        self.task_summary = TaskSummary(fmt=summary_format)  # to contain summaries reported by each expert
+        self.profiling = {}  # measures of the parsing/comparison by each expert
+        self.consistency = TaskSummary(fmt=summary_format)  # contains consistency comparisons outputs
+        self.continuity = TaskSummary(fmt=summary_format)  # contains continuity comparisons outputs
         # ExpertBoard AlgoComponent is ran only if the task did not crash
         self.task_summary['Status'] = task_status['E']
 
     def process(self, consistency=None, continuity=None):
-        """Process experts. Cf. :meth:`compare` for arguments."""
-        logger.info("Expertise: parsing start.")
-        self.parse()
-        logger.info("Expertise: parsing end.")
-        if consistency or continuity:  # at least one provided and not empty
-            logger.info("Expertise: comparison start.")
-            self.compare(consistency, continuity)
-            logger.info("Expertise: comparison end.")
-        else:
-            logger.info('Expertise: no reference resource available => no comparison processed.')
-            self._notify_no_ref_resource('consistency')
-            self._notify_no_ref_resource('continuity')
-        self.task_summary['Updated'] = date.utcnow().isoformat().split('.')[0]
-        self.dump()
-        logger.info("Expertise: dumped to file.")
+        """
+        Process experts. Cf. :meth:`compare` for arguments.
+        Pools of workers of the experts are then shut down
+        (after side experts, if processed in background).
+        """
+        try:
+            if self.fast_verdict is None:
+                self._process(self.experts, consistency, continuity)
+            else:
+                side_experts = [e for e in self.experts if e.side_expert]
+                self._process([e for e in self.experts if not e.side_expert], consistency, continuity)
+                logger.info("Expertise: verdict dumped.")
+                if side_experts and self.fast_verdict == 'after':
+                    self._process(side_experts, consistency, continuity)
+                elif side_experts and self.fast_verdict == 'background':
+                    logger.info("Expertise: side experts processed in background.")
+                    self._side_thread = threading.Thread(target=self._process_in_background,
+                                                         args=(side_experts, consistency, continuity),
+                                                         name='side_experts')
+                    self._side_thread.start()
+        finally:
+            if self._side_thread is None:
+                self.workers_pools.shutdown()
+
+    def _process_in_background(self, experts, consistency=None, continuity=None):
+        """Process **experts**, then shut pools of workers down."""
+        try:
+            self._process(experts, consistency, continuity)
+        finally:
+            self.workers_pools.shutdown()
+
+    def wait(self):
+        """Wait for the side experts processed in background (fast verdict mode), if any."""
+        if self._side_thread is not None:
+            self._side_thread.join()
+            self._side_thread = None
+
+    def _process(self, experts, consistency=None, continuity=None):
+        """Process **experts**, then dump."""
+        try:
+            logger.info("Expertise: parsing start.")
+            self.parse(experts)
+            logger.info("Expertise: parsing end.")
+            if consistency or continuity:  # at least one provided and not empty
+                logger.info("Expertise: comparison start.")
+                self.compare(consistency, continuity, experts)
+                logger.info("Expertise: comparison end.")
+            else:
+                logger.info('Expertise: no reference resource available => no comparison processed.')
+                self._notify_no_ref_resource('consistency')
+                self._notify_no_ref_resource('continuity')
+            self.task_summary['Updated'] = date.utcnow().isoformat().split('.')[0]
+        finally:
+            self.dump()  # whatever has been gathered, even if interrupted
+            logger.info("Expertise: dumped to file.")
 
     def add_expert(self, expert_kwargs):
         """Instanciate expert and register it to ExpertBoard."""
+        load_experts(expert_kwargs)
         expert = fpx.outputexpert(**expert_kwargs)
         if expert is not None:
+            expert.listings_cache = self.listings_cache
+            expert.workers_pools = self.workers_pools
+            self._time_budgets[expert.kind] = expert.time_budget
             self.experts.append(expert)
         else:
             message = "No Expert was found for attributes: " + str(expert_kwargs)
@@ -136,20 +544,105 @@ class ExpertBoard(object):
             else:
                 logger.warning(message)
 
-    def parse(self):
+    def _concurrency(self, experts):
+        """
+        Concurrency of the processing of **experts**: self.concurrency, but experts
+        cannot be interrupted out of the main thread (cf. :func:`_time_limited`);
+        if a time budget applies, they are then processed one at a time in a pool
+        thread, to be abandoned if late (cf. :meth:`_result`).
+        """
+        if (self.concurrency is None and not _can_interrupt() and
+                any([self._time_budget(e) is not None for e in experts])):
+            return 'threads'
+        return self.concurrency
+
+    def _executor(self, concurrency):
+        """Get a new pool executor, according to **concurrency** (cf. :meth:`_concurrency`)."""
+        executor_class = getattr(concurrent.futures, self.concurrency_modes[concurrency])
+        return executor_class(max_workers=self.max_workers if concurrency == self.concurrency else 1)
+
+    def _job_budget(self, expert, concurrency, steps=1):
+        """Time budget to be applied within a job: none in threads, abandoned instead if late."""
+        return self._time_budget(expert, steps) if concurrency != 'threads' else None
+
+    def _time_budget(self, expert, steps=1):
+        """Time budget of **expert** (for **steps** comparisons at once): its own, or else the board's one."""
+        time_budget = self._time_budgets.get(expert.kind)
+        if time_budget is None:
+            time_budget = self.time_budget
+        return time_budget * steps if time_budget is not None else None
+
+    def _result(self, future, starts, job, time_budget, concurrency):
+        """
+        Get the result of a pool **future**. Experts cannot be interrupted in
+        'threads' **concurrency**: if the **job** runs for more than **time_budget**
+        since it started (cf. **starts**), it is abandoned and
+        :class:`ExpertTimeout` is raised.
+        """
+        if concurrency != 'threads' or time_budget is None:
+            return future.result()
+        while job not in starts:  # still waiting in queue
+            concurrent.futures.wait([future], timeout=0.1)
+        try:
+            return future.result(timeout=max(starts[job] + time_budget - time.monotonic(), 0))
+        except concurrent.futures.TimeoutError:
+            self._abandoned_jobs = True
+            raise ExpertTimeout("Time budget exceeded ({}s), expert abandoned".format(time_budget))
+
+    def parse(self, experts=None):
         """
         Ask experts to parse whatever information they are supposed to,
         collecting information into self.task_summary.
+
+        :param experts: a subset of the experts of the board (default: all)
         """
-        for e in self.experts:
-            logger.info(f"Start parsing with expert: {e.kind}...")
-            self.task_summary[e.kind] = e.parse()
-            logger.info("... complete.")
+        if experts is None:
+            experts = self.experts
+        concurrency = self._concurrency(experts)
+        if concurrency is None:
+            for e in experts:
+                logger.info(f"Start parsing with expert: {e.kind}...")
+                _, self.task_summary[e.kind], measures = _parse_with(e, self.results_cache,
+                                                                     self._time_budget(e))
+                self._remember_measures(e, 'parse', measures)
+                self._dump_incrementally('task_summary')
+                logger.info("... complete.")
+        else:
+            logger.info(f"Start parsing with experts, concurrently ({concurrency})...")
+            executor = self._executor(concurrency)
+            starts = {}
+            try:
+                futures = [executor.submit(_started, starts, i,
+                                           _parse_with, e, self.results_cache,
+                                           self._job_budget(e, concurrency))
+                           for i, e in enumerate(experts)]
+                # collect in the order of experts, for the summary to be deterministic
+                for i, future in enumerate(futures):
+                    expert = experts[i]
+                    time_budget = self._time_budget(expert)
+                    try:
+                        parsed, summary, measures = self._result(future, starts, i, time_budget, concurrency)
+                    except ExpertTimeout as e:
+                        logger.error(f"Expert {expert.kind}: parsing interrupted: {e}")
+                        summary, measures = _timeout_summary('Parsing', e), {'Timeout (s)':time_budget}
+                    else:
+                        parsed.listings_cache = self.listings_cache  # lost if returned from another process
+                        self.experts[self.experts.index(expert)] = parsed
+                    self.task_summary[expert.kind] = summary
+                    self._remember_measures(expert, 'parse', measures)
+                    self._dump_incrementally('task_summary')
+                    logger.info(f"... parsing with expert: {expert.kind} complete.")
+            finally:
+                executor.shutdown(wait=not self._abandoned_jobs)
+        for e in experts:
+            if self.task_summary[e.kind].get('Parsing') == 'Timeout':
+                self.timed_out.add(e.kind)
             if self.task_summary[e.kind].get('Auto-test', None) == 'Failed':
                 self.task_summary['Status'] = task_status['F']
-        self.task_summary.dump('task_summary.json')
+        self.listings_cache.clear()  # test listings have been parsed by all experts
+        self.task_summary.dump(self.summary_files['task_summary'])
 
-    def compare(self, consistency=None, continuity=None):
+    def compare(self, consistency=None, continuity=None, experts=None):
         """
         Ask experts to compare to references, collecting comparison
         information into self.against_summary.
@@ -158,31 +651,106 @@ class ExpertBoard(object):
             as a list of dicts: {'rh': Vortex resource handler, 'ref_is': ...}
         :param continuity: the list of continuity reference resource,
             as a list of dicts: {'rh': Vortex resource handler, 'ref_is': ...}
+        :param experts: a subset of the experts of the board (default: all)
         """
+        if experts is None:
+            experts = self.experts
+        else:  # experts may have been replaced in the board by their parsed copy
+            kinds = [e.kind for e in experts]
+            experts = [e for e in self.experts if e.kind in kinds]
         if consistency:
             ref_task = [r['ref_is']['task'] for r in consistency]
             if len(set(ref_task)) > 1:
                 raise ExpertError("Consistency reference resources must all come from the same 'task'.")
             else:
                 self.consistency['referenceTask'] = ref_task[0]
-        for e in self.experts:
-            logger.info(f"Start comparison with expert: {e.kind}...")
-            if consistency:
-                logger.info('(consistency)')
-                self.consistency[e.kind] = e.compare([r['rh'] for r in consistency])
-            if continuity:
-                logger.info('(continuity)')
-                self.continuity[e.kind] = e.compare([r['rh'] for r in continuity])
-            logger.info("... complete.")
+        for e in experts:
+            if e.kind in self.timed_out:  # no comparison without a complete parsing
+                for (which, references) in (('consistency', consistency),
+                                            ('continuity', continuity)):
+                    if references:
+                        getattr(self, which)[e.kind] = _timeout_summary(
+                            'Comparison', 'Parsing has exceeded its time budget')
+        experts = [e for e in experts if e.kind not in self.timed_out]
+        references = [(which, [r['rh'] for r in refs])
+                      for (which, refs) in (('consistency', consistency),
+                                            ('continuity', continuity))
+                      if refs]
+        # experts able to compare to all references at once do so, others compare to each in turn
+        jobs = []
+        for e in experts:
+            if e.multi_reference and len(references) > 1:
+                jobs.append((e, dict(references)))
+            else:
+                jobs.extend([(e, {which:refs}) for (which, refs) in references])
+        concurrency = self._concurrency(experts)
+        if concurrency is None:
+            for (e, refs) in jobs:
+                logger.info(f"Start comparison with expert: {e.kind} ({', '.join(refs)})...")
+                comps, measures = _compare_with(e, refs, self.results_cache,
+                                                self._time_budget(e, len(refs)))
+                self._collect_comparisons(e, comps, measures)
+                logger.info("... complete.")
+        else:
+            logger.info(f"Start comparison with experts, concurrently ({concurrency})...")
+            executor = self._executor(concurrency)
+            starts = {}
+            try:
+                futures = [executor.submit(_started, starts, i,
+                                           _compare_with, e, refs, self.results_cache,
+                                           self._job_budget(e, concurrency, len(refs)))
+                           for i, (e, refs) in enumerate(jobs)]
+                # collect in the order of submission, for the summaries to be deterministic
+                for i, ((e, refs), future) in enumerate(zip(jobs, futures)):
+                    time_budget = self._time_budget(e, len(refs))
+                    try:
+                        comps, measures = self._result(future, starts, i, time_budget, concurrency)
+                    except ExpertTimeout as exc:
+                        logger.error(f"Expert {e.kind}: comparison ({', '.join(refs)}) interrupted: {exc}")
+                        comps = {which:_timeout_summary('Comparison', exc) for which in refs}
+                        measures = {'Timeout (s)':time_budget}
+                    self._collect_comparisons(e, comps, measures)
+                    logger.info(f"... comparison with expert: {e.kind} ({', '.join(refs)}) complete.")
+            finally:
+                executor.shutdown(wait=not self._abandoned_jobs)
+        # reference listings and summaries have been parsed by all experts
+        self.listings_cache.clear()
+        reference_summaries.clear()
 
         for comp_summary in ('consistency', 'continuity'):
             self._status(comp_summary)
 
+    def _collect_comparisons(self, expert, comps, measures):
+        """Save the comparisons (by summary) of **expert** and their measures."""
+        self._remember_measures(expert, 'compare ({})'.format(', '.join(comps)), measures)
+        for which, comp in comps.items():
+            getattr(self, which)[expert.kind] = comp
+            self._dump_incrementally(which)
+
+    def _dump_incrementally(self, which_summary):
+        """
+        Dump **which_summary** as gathered so far, for it to be available even if
+        the expertise is interrupted. Comparison status is then provisional.
+        """
+        if which_summary != 'task_summary':
+            self._status(which_summary)
+        getattr(self, which_summary).dump(self.summary_files[which_summary])
+
+    def _remember_measures(self, expert, step, measures):
+        """Save measures of an expert **step** into task summary."""
+        self.profiling.setdefault(expert.kind, {})[step] = measures
+        self.task_summary['_Expertise profiling'] = self.profiling
+
     def _status(self, which_summary):
         """State about the comparison to reference."""
         comp_summary = getattr(self, which_summary)
-        if len(comp_summary) > 0:
-            status_order = ['-', '0', '?', 'OK', 'KO', '!', '+']
+        if comp_summary.get('comparisonStatus', {}).get('symbol') == '+':
+            # reference was crashed, as stated by a previous (provisional) status:
+            # keep that message, and empty comp_summary from later experts
+            for e in self.experts:
+                comp_summary.pop(e.kind, None)
+        elif len(comp_summary) > 0:
+            status_order = ['-', '0', '?', 'OK', 'KO', 'T', '!', '+']
             # by default, unknown status (e.g. if no expert has a Validated key)
             comp_summary['comparisonStatus'] = {'symbol':'-',
                                                 'short':'- No expert -',
@@ -205,6 +773,10 @@ class ExpertBoard(object):
                         status = {'symbol':'KO',
                                   'short':'KO',
                                   'text':'Fail: "{}" is False'.format(comp_summary[e.kind].get('Validated means', '(?)'))}
+                elif e.kind in comp_summary and comp_summary[e.kind].get('Comparison') == 'Timeout':
+                    status = {'symbol':'T',
+                              'short':'! Timeout !',
+                              'text':'To be checked: expert exceeded its time budget ({})'.format(e.kind)}
                 elif e.kind in comp_summary and comp_summary[e.kind].get('Comparison') == 'Failed':
                     # else, if we found at least one comparison failure, raise it as status
                     status = {'symbol':'!',
@@ -221,7 +793,10 @@ class ExpertBoard(object):
                 if status_order.index(status['symbol']) >= status_order.index(comp_summary['comparisonStatus']['symbol']):
                     # several OK or KO: gather
                     if status['symbol'] == comp_summary['comparisonStatus']['symbol'] and status['symbol'] in ('OK', 'KO'):
-                        comp_summary['comparisonStatus']['text'] += ' | ' + status['text']
+                        # not in place: comparisonStatus may be shared with an expert's summary
+                        comp_summary['comparisonStatus'] = dict(comp_summary['comparisonStatus'],
+                                                                text=comp_summary['comparisonStatus']['text'] +
+                                                                ' | ' + status['text'])
                     else:
                         comp_summary['comparisonStatus'] = status
             # identify leadExpert
@@ -275,6 +850,6 @@ class ExpertBoard(object):
 
     def dump(self):
         """Dump output."""
-        self.task_summary.dump('task_summary.json')  # again, in case there has been some delayed parsing
-        self.consistency.dump('task_consistency.json')
-        self.continuity.dump('task_continuity.json')
+        for which_summary, filename in self.summary_files.items():
+            # task summary again, in case there has been some delayed parsing: only changes are re-serialized
+            getattr(self, which_summary).dump(filename)
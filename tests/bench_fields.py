@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks of the bit-repro check of fields data: fields.data_equal,
+versus the former whole-array check numpy.all(test == ref).
+
+Usage: bench_fields.py [repeat]
+"""
+import sys
+import timeit
+import tracemalloc
+
+import numpy
+
+from ial_expertise.experts.fields import data_equal
+
+#: Representative fields sizes: LAM surface field, global ~10km level, 3D LAM block
+SIZES = {'LAM 2D (750x720)':750 * 720,
+         'global 2D (~10km)':6599680,
+         'LAM 3D (750x720x15)':750 * 720 * 15}
+
+
+def former(test, ref):
+    return bool(numpy.all(test == ref))
+
+
+def cases(size):
+    rng = numpy.random.default_rng(0)
+    ref = rng.random(size)
+    yield 'equal', ref, ref.copy()
+    test = ref.copy()
+    test[-1] += 1.
+    yield 'differs (last)', test, ref
+    test = ref.copy()
+    test[0] += 1.
+    yield 'differs (first)', test, ref
+    mask = numpy.zeros(size, dtype=bool)
+    mask[::3] = True
+    ref = numpy.ma.masked_array(ref, mask=mask)
+    yield 'masked, equal', ref, ref.copy()
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(repeat=5):
+    print('{:22} {:16} {:>12} {:>12} {:>14} {:>14}'.format('size', 'case', 'former (ms)', 'kernel (ms)',
+                                                          'former (Mb)', 'kernel (Mb)'))
+    for name, size in SIZES.items():
+        for case, test, ref in cases(size):
+            times = [min(timeit.repeat(lambda: f(test, ref), number=1, repeat=repeat)) * 1000
+                     for f in (former, data_equal)]
+            memory = [peak_memory(f, test, ref) / 1024 ** 2 for f in (former, data_equal)]
+            print('{:22} {:16} {:12.2f} {:12.2f} {:14.2f} {:14.2f}'.format(name, case, *(times + memory)))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
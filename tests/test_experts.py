@@ -5,10 +5,17 @@
 # http://www.cecill.info
 
 from unittest import main, TestCase
+import concurrent.futures
 import io
+import json
+import os
+import shutil
+import tempfile
 import time
 
-from ial_expertise.experts import oops, util
+import numpy
+
+from ial_expertise.experts import oops, util, caches, fields
 
 timing = False
 
@@ -43,5 +50,546 @@ class Test_oops(TestCase):
     def test_interpol(self):
         self.assertTrue(oops.OOPSInterpolExpert._re_test.match(util.test_interpol))
 
+
+class Test_fields(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _grib(self, filename, datas, validity=None):
+        """
+        Write a GRIB file with a field for each data of **datas**, return its path.
+        **validity** may be a (basis, term) of the fields.
+        """
+        import epygram
+        epygram.init_env()
+        sample = os.path.join(os.path.dirname(epygram.__file__), 'data', 'grib_samples', 'GRIB2_grid_simple.tmpl')
+        fld = epygram.formats.resource(sample, 'r').readfield({'shortName':'t'})
+        if validity is not None:
+            fld.validity = epygram.base.FieldValidity(basis=validity[0], term=validity[1])
+        filename = os.path.join(self.tmpdir, filename)
+        out = epygram.formats.resource(filename, 'w', fmt='GRIB')
+        for i, data in enumerate(datas):
+            fld.fid['GRIB2'] = dict(fld.fid['GRIB2'], parameterNumber=i)
+            fld.setdata(data.reshape(fld.data.shape))
+            out.writefield(fld, packing={'packingType':'grid_simple', 'bitsPerValue':32})
+        out.close()
+        return filename
+
+    def _fa(self, filename, datas, names=('SURFTEMPERATURE', 'SURFPRESSION', 'SURFRESERV.NEIGE')):
+        """Write a FA file with a field for each data of **datas**, return its path."""
+        import epygram
+        epygram.init_env()
+        sample = os.path.join(os.path.dirname(epygram.__file__), 'data', 'grib_samples', 'GRIB2_grid_simple.tmpl')
+        fld = epygram.formats.resource(sample, 'r').readfield({'shortName':'t'})
+        geometry = fld.geometry.deepcopy()
+        geometry.dimensions = {'X':40, 'Y':40}
+        geometry.grid['input_position'] = (0, 39)
+        filename = os.path.join(self.tmpdir, filename)
+        out = epygram.formats.resource(filename, 'w', fmt='FA', geometry=geometry, validity=fld.validity)
+        for name, data in zip(names, datas):
+            fld = epygram.fields.H2DField(fid={'FA':name}, geometry=geometry,
+                                          validity=out.validity, structure='H2D')
+            fld.setdata(data.reshape((40, 40)))
+            out.writefield(fld)
+        out.close()
+        return filename
+
+    def test_raw_precheck(self):
+        from unittest import mock
+        rng = numpy.random.default_rng(0)
+        for fmt, writer, size in (('GRIB', self._grib, 31 * 16), ('FA', self._fa, 40 * 40)):
+            ref = [rng.random(size) for _ in range(3)]
+            test = [d + (rng.normal(0, 1e-3, d.size) if i == 1 else 0.) for i, d in enumerate(ref)]
+            test = writer('test.' + fmt, test)
+            ref = writer('ref.' + fmt, ref)
+            decoded = fields.compare_2_files(test, ref, hide_bit_repro_fields=False, raw_precheck=False)
+            with mock.patch.object(fields, 'compare_2_fields', wraps=fields.compare_2_fields) as compare:
+                raw = fields.compare_2_files(test, ref, hide_bit_repro_fields=False)
+                self.assertEqual(compare.call_count, 1)  # only the modified field is decoded
+            self.assertEqual(raw, decoded)
+            self.assertFalse(raw['Bit-reproducible'])
+            # identical records, in different files: nothing is decoded
+            ref = [rng.random(size) for _ in range(2)]
+            test = writer('test.' + fmt, ref + [rng.random(size)])
+            ref = writer('ref.' + fmt, ref)
+            with mock.patch.object(fields, 'compare_2_fields') as compare:
+                comp = fields.compare_2_files(test, ref)
+                compare.assert_not_called()
+            self.assertTrue(comp['Bit-reproducible'])
+            self.assertEqual(len(comp['New fields']), 1)
+            # concurrent batches of fields: raw records are scanned once, in the parent process
+            pid = os.getpid()
+            of = fields.RawRecords.of
+
+            def scan(resource):
+                self.assertEqual(os.getpid(), pid)
+                return of(resource)
+            with mock.patch.object(fields.RawRecords, 'of', side_effect=scan) as scans:
+                self.assertEqual(fields.compare_2_files(test, ref, fields_workers=2), comp)
+            self.assertEqual(scans.call_count, 2)
+
+    def test_identical_files(self):
+        from unittest import mock
+        rng = numpy.random.default_rng(0)
+        ref = self._grib('ref.grb', [rng.random(31 * 16) for _ in range(3)])
+        test = os.path.join(self.tmpdir, 'test.grb')
+        shutil.copy(ref, test)
+        with mock.patch.object(fields, 'identical_files', return_value=False):
+            expected = fields.compare_2_files(test, ref, hide_bit_repro_fields=False, raw_precheck=False)
+        with mock.patch.object(fields, 'compare_fields') as compare:
+            self.assertEqual(fields.compare_2_files(test, ref, hide_bit_repro_fields=False), expected)
+            compare.assert_not_called()
+        self.assertTrue(expected['Bit-reproducible'])
+        self.assertEqual(len(expected['Common fields differences']), 3)
+
+    def test_reference_index(self):
+        from unittest import mock
+        rng = numpy.random.default_rng(0)
+        ref = [rng.random(31 * 16) for _ in range(3)]
+        test = self._grib('test.grb', [d + (rng.normal(0, 1e-3, d.size) if i == 1 else 0.)
+                                       for i, d in enumerate(ref)])
+        ref = self._grib('ref.grb', ref)
+        kwargs = dict(hide_bit_repro_fields=False, raw_precheck=False, memory_budget=0.01)
+        expected = fields.compare_2_files(test, ref, **kwargs)
+        self.assertEqual(fields.compare_2_files(test, ref, reference_index=True, **kwargs), expected)
+        self.assertTrue(os.path.exists(ref + fields.FieldsIndex.suffix))
+        for workers in (1, 2):
+            with mock.patch.object(fields, 'read_field', wraps=fields.read_field) as read:
+                comp = fields.compare_2_files(test, ref, reference_index=True, fields_workers=workers, **kwargs)
+                if workers == 1:  # test fields, and only the modified field from ref
+                    self.assertEqual(read.call_count, 3 + 1)
+            self.assertEqual(comp, expected)
+        # fields that differ only in basis/term are not validated, with or without the index
+        import datetime
+        basis = datetime.datetime(2020, 1, 1)
+        data = [numpy.arange(31 * 16.)]
+        vtest = self._grib('vtest.grb', data, (basis + datetime.timedelta(hours=3), datetime.timedelta(hours=3)))
+        vref = self._grib('vref.grb', data, (basis, datetime.timedelta(hours=6)))
+        vexpected = fields.compare_2_files(vtest, vref, **kwargs)
+        self.assertFalse(vexpected['Validated'])
+        for _ in range(2):  # index written, then used
+            self.assertEqual(fields.compare_2_files(vtest, vref, reference_index=True, **kwargs), vexpected)
+        # a copy of ref: index still valid
+        shutil.copy(ref, ref + '.copy')
+        shutil.copy(ref + fields.FieldsIndex.suffix, ref + '.copy' + fields.FieldsIndex.suffix)
+        self.assertEqual(len(fields.FieldsIndex(ref + '.copy').fields), 3)
+        # modified ref: index is invalidated
+        self._grib('ref.grb', [rng.random(31 * 16) for _ in range(3)])
+        self.assertEqual(fields.FieldsIndex(ref).fields, {})
+        self.assertEqual(fields.compare_2_files(test, ref, reference_index=True, **kwargs),
+                         fields.compare_2_files(test, ref, **kwargs))
+
+    def test_resources_cache(self):
+        rng = numpy.random.default_rng(0)
+        ref = self._grib('ref.grb', [rng.random(31 * 16) for _ in range(3)])
+        test = self._grib('test.grb', [rng.random(31 * 16) for _ in range(2)])
+        cache = caches.ResourcesCache(max_idle=1)
+        fids = cache.listfields(ref)
+        self.assertEqual(len(fids), 3)
+        self.assertIs(cache.listfields(ref), fids)
+        with cache.opened(ref) as r:
+            with cache.opened(ref) as r2:  # in use: another one is opened
+                self.assertIsNot(r2, r)
+        with cache.opened(ref) as r3:  # the most recently returned one is reused...
+            self.assertIs(r3, r)
+        self.assertFalse(r2.isopen)  # ...the others are closed
+        self.assertEqual(fields.compare_2_files(test, ref, resources=cache),
+                         fields.compare_2_files(test, ref))
+        # modified file: listed again
+        self._grib('ref.grb', [rng.random(31 * 16) for _ in range(2)])
+        self.assertEqual(len(cache.listfields(ref)), 2)
+        cache.clear()
+
+    def test_compare_files(self):
+        from unittest import mock
+        rng = numpy.random.default_rng(0)
+        test = [rng.random(31 * 16) for _ in range(3)]
+        refs = [self._grib('ref1.grb', [d + (rng.normal(0, 1e-3, d.size) if i == 1 else 0.)
+                                        for i, d in enumerate(test)]),
+                self._grib('ref2.grb', test[:2])]
+        test = self._grib('test.grb', test)
+        kwargs = dict(hide_bit_repro_fields=False, raw_precheck=False)
+        expected = [fields.compare_2_files(test, ref, **kwargs) for ref in refs]
+        with mock.patch.object(fields, 'read_field', wraps=fields.read_field) as read:
+            self.assertEqual(fields.compare_files(test, refs, **kwargs), expected)
+            self.assertEqual(read.call_count, 3 + 3 + 2)  # test fields are read once
+        self.assertEqual(fields.compare_files(test, refs, fields_workers=2, **kwargs), expected)
+        self.assertEqual(expected[1]['Lost fields'], None)
+        self.assertEqual(len(expected[1]['New fields']), 1)
+
+    def test_field_stats(self):
+        rng = numpy.random.default_rng(0)
+        data = rng.random(100001) * 10.
+        fld = self._field(data)
+        stats = fields.field_stats(data, extended=True)
+        self.assertEqual(stats['NaN'], 0)
+        for k, v in (('min', fld.min()), ('avg', fld.mean()), ('max', fld.max()), ('std', fld.std())):
+            self.assertAlmostEqual(stats[k], v, places=12)
+        data[5] = numpy.nan
+        data = numpy.ma.masked_array(data, mask=numpy.arange(data.size) % 3 == 0)
+        stats = fields.field_stats(data, extended=True)
+        self.assertEqual(stats['NaN'], 1)
+        self.assertAlmostEqual(stats['avg'], numpy.ma.masked_invalid(data).mean(), places=12)
+        self.assertEqual(fields.field_stats(numpy.array(['a'])), {})
+
+    def test_parse_stats(self):
+        from unittest import mock
+        from footprints import proxy as fpx
+        from ial_expertise.cli.expertise_batch import LocalResourceHandler
+        rng = numpy.random.default_rng(0)
+        ref = [rng.random(31 * 16) for _ in range(3)]
+        self._grib('PFFCSTAREA+0001', [d + (rng.normal(0, 1e-3, d.size) if i == 1 else 0.)
+                                       for i, d in enumerate(ref)])
+        self._grib('ref.PFFCSTAREA+0001', ref)
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            fields.compare_2_files('PFFCSTAREA+0001', 'ref.PFFCSTAREA+0001', reference_index=True)
+            summaries = []
+            for workers in (2, 1):
+                expert = fpx.outputexpert(kind='gridpoint', expert='fields_in_file', fatal_exceptions=True,
+                                          compute_stats=True, reference_index=True, fields_workers=workers)
+                summaries.append(expert.parse())
+            self.assertEqual(summaries[0], summaries[1])
+            stats = summaries[0]['Files']['PFFCSTAREA+0001']['Stats']
+            self.assertEqual(len(stats), 3)
+            self.assertEqual(sorted(list(stats.values())[0].keys()), ['avg', 'max', 'min'])
+            # fields fingerprinted in parsing are not read again if found bit-repro to ref index
+            with mock.patch.object(fields, 'read_field', wraps=fields.read_field) as read:
+                comp = expert.compare([LocalResourceHandler('gridpoint', 'ref.PFFCSTAREA+0001')])
+                self.assertEqual(read.call_count, 2)  # test and ref of the modified field
+            self.assertEqual(len(comp['PFFCSTAREA+0001']['Common fields differences']), 1)
+        finally:
+            os.chdir(cwd)
+
+    def test_parallel_backends(self):
+        from ial_expertise.cli.expertise_batch import LocalResourceHandler
+        rng = numpy.random.default_rng(0)
+        references = []
+        for term in range(3):
+            ref = [rng.random(31 * 16) for _ in range(term + 2)]
+            self._grib('PFFCSTAREA+000{}'.format(term), [d + (1e-3 if i == 1 else 0.) for i, d in enumerate(ref)])
+            self._grib('ref.PFFCSTAREA+000{}'.format(term), ref)
+            references.append(LocalResourceHandler('gridpoint', 'ref.PFFCSTAREA+000{}'.format(term)))
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            pairs = [('PFFCSTAREA+000{}'.format(t), 'ref.PFFCSTAREA+000{}'.format(t)) for t in range(3)]
+            self.assertEqual(fields.largest_first(pairs), pairs[::-1])
+            expected = self._expert(parallel=False).compare(references)
+            self.assertFalse(expected['Validated'])
+            self.assertEqual(self._expert(read_ahead=2).compare(references), expected)
+            for backend, binding in (('processes', True), ('processes', False), ('threads', False), ('serial', False)):
+                expert = self._expert(parallel=True, parallel_backend=backend,
+                                    parallel_workers=2, parallel_binding=binding)
+                with util.collected_measures() as reported:
+                    self.assertEqual(expert.compare(references), expected)
+                throughput, = reported['Workers throughput']
+                self.assertEqual(sum([w['Files'] for w in throughput.values()]), 3)
+            # several sets of references: each test file is compared to all of them at once
+            from unittest import mock
+            for parallel, backend in ((False, 'threads'), (True, 'threads'), (True, 'processes')):
+                expert = self._expert(parallel=parallel, parallel_backend=backend, parallel_workers=2)
+                with mock.patch.object(fields, 'compare_files', wraps=fields.compare_files) as compare:
+                    self.assertEqual(expert.compare_multi({'consistency':references, 'continuity':references}),
+                                     {'consistency':expected, 'continuity':expected})
+                if backend == 'threads':
+                    self.assertEqual(compare.call_count, len(pairs))
+            with self.assertRaises(fields.ExpertError):
+                fields.compare_pairs([pairs[0] + (pairs[1][1],)], backend='taylorism')
+            _, throughput = fields.compare_pairs(pairs, backend='threads', workers=2)
+            self.assertLessEqual(len(throughput), 2)
+            self.assertEqual(sum([w['Files'] for w in throughput.values()]), 3)
+            # warm pool, kept across comparisons
+            pools = caches.WorkersPools()
+            workers = set()
+            for _ in range(2):
+                _, throughput = fields.compare_pairs(pairs, backend='processes', workers=2, pools=pools)
+                workers.update(throughput.keys())
+            self.assertEqual(len(pools), 1)
+            self.assertLessEqual(len(workers), 2)
+            pools.shutdown()
+            self.assertEqual(len(pools), 0)
+            # memory ceiling
+            self.assertEqual(fields.largest_field_size(pairs[0][0]), 31 * 16)
+            memory = fields.estimated_memory(pairs[0])
+            expert = self._expert(parallel=True, parallel_backend='processes', parallel_workers=2,
+                                  parallel_memory=memory * 1.5)
+            self.assertEqual(expert.compare(references), expected)
+        finally:
+            os.chdir(cwd)
+
+    def test_read_ahead(self):
+        from unittest import mock
+        items = []
+        for i in range(6):
+            items.append([os.path.join(self.tmpdir, '{}.{}'.format(n, i)) for n in ('test', 'ref')])
+            for f in items[-1]:
+                with open(f, 'wb') as out:
+                    out.write(os.urandom(1000 * i + 1))
+        for depth in (1, 2):
+            processed = []
+            ahead = []
+
+            def warm(filename):
+                ahead.append(len(processed) + depth - int(filename.split('.')[-1]))
+                time.sleep(0.01)
+
+            with mock.patch.object(util, 'warm_file', side_effect=warm):
+                with util.ReadAhead(items, depth=depth) as read_ahead:
+                    for item in read_ahead:
+                        processed.append(item)
+                        time.sleep(0.02)
+            self.assertEqual(processed, items)
+            self.assertGreaterEqual(min(ahead), 0)  # never further than depth
+        with util.ReadAhead(items + [items[0]], depth=len(items), files=lambda item: item[:1]) as read_ahead:
+            for _ in read_ahead:
+                time.sleep(0.02)
+        self.assertEqual(read_ahead.warmed, [item[0] for item in items[1:]])  # no file read twice
+
+    def _expert(self, **kwargs):
+        from footprints import proxy as fpx
+        return fpx.outputexpert(kind='gridpoint', expert='fields_in_file', fatal_exceptions=True, **kwargs)
+
+    def test_memory_admission(self):
+        from unittest import mock
+        pairs = [('test{}'.format(i), 'ref{}'.format(i)) for i in range(6)]
+        running = []
+        concurrency = []
+
+        def comparison(test, ref, **kwargs):
+            running.append(test)
+            concurrency.append(len(running))
+            time.sleep(0.05)
+            running.remove(test)
+            return test, {}, ('worker', 0, 0.05)
+
+        memory = {p:m for p, m in zip(pairs, (300., 100., 600., 100., 100., 100.))}
+        with mock.patch.object(fields, 'estimated_memory', side_effect=lambda pair, **kw: memory[pair]), \
+                mock.patch.object(fields, '_timed_comparison', side_effect=comparison):
+            comps, _ = fields.compare_pairs(pairs, backend='threads', workers=4, max_memory=350.)
+            self.assertEqual(list(comps.keys()), [p[0] for p in pairs])
+            self.assertEqual(max(concurrency), 3)  # 3 x 100
+            concurrency[:] = []
+            fields.compare_pairs(pairs, backend='threads', workers=4)
+            self.assertEqual(max(concurrency), 4)
+            # comparisons sharing a pool stay together under the ceiling
+            pools = caches.WorkersPools()
+            estimates = dict(memory)
+            memory.update({p:200. for p in pairs})
+            concurrency[:] = []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                calls = [executor.submit(fields.compare_pairs, pairs[i::2], backend='threads', workers=4,
+                                         max_memory=350., pools=pools)
+                         for i in range(2)]
+                self.assertEqual(sorted(sum([list(c.result()[0].keys()) for c in calls], [])),
+                                 sorted([p[0] for p in pairs]))
+            pools.shutdown()
+            self.assertEqual(max(concurrency), 1)
+            memory.update(estimates)
+            # the taylorism scheduler would never start a worker declared over the ceiling (test2)
+            report = {'workers_report':[{'report':comparison(*p)} for p in pairs]}
+            with mock.patch.object(fields, 'batch_main', return_value=report) as batch:
+                fields.compare_pairs(pairs, backend='taylorism', workers=4, max_memory=350.)
+            instructions = batch.call_args[1]['individual_instructions']
+            self.assertEqual(dict(zip(instructions['test'], instructions['memory'])),
+                             {'test0':300., 'test1':100., 'test2':350., 'test3':100., 'test4':100., 'test5':100.})
+        # FA frame
+        self.assertEqual(fields.largest_field_size(self._fa('a.fa', [numpy.zeros(40 * 40)] * 3)), 40 * 40)
+
+    def test_meta_diffs(self):
+        from epygram.util import Angle
+        fld = self._field(numpy.zeros(1))  # any field
+        sample = fields.read_field(self._resource(self._grib('a.grb', [numpy.zeros(31 * 16)] * 2)),
+                                   {'parameterNumber':0})
+        geometries = [sample.geometry.deepcopy() for _ in range(3)]
+        geometries[2].grid['X_resolution'] = Angle(2 * geometries[2].grid['X_resolution'].get('degrees'),
+                                                   'degrees')
+        memo = fields.MetaDiffs()
+        for _ in range(2):
+            for test in geometries:
+                for ref in geometries:
+                    self.assertEqual(memo.diff(test, ref), test.recursive_diff(ref))
+        self.assertEqual(len(memo), 4)  # 2 distinct geometries
+        self.assertIsNone(memo.diff(sample.validity, sample.validity.deepcopy()))
+        self.assertIsNone(memo.diff(fld, fld))
+
+    def _resource(self, filename):
+        from ial_expertise.experts.util import init_epygram
+        return init_epygram().formats.resource(filename, 'r')
+
+    def test_fields_workers(self):
+        rng = numpy.random.default_rng(0)
+        ref = [rng.random(31 * 16) for _ in range(6)]
+        test = [d + (rng.normal(0, 1e-3, d.size) if i % 2 else 0.) for i, d in enumerate(ref)]
+        test = self._grib('test.grb', test)
+        ref = self._grib('ref.grb', ref)
+        serial = fields.compare_2_files(test, ref, hide_bit_repro_fields=False)
+        concurrent = fields.compare_2_files(test, ref, hide_bit_repro_fields=False, fields_workers=2)
+        self.assertEqual(serial, concurrent)
+        self.assertEqual(list(serial['Common fields differences'].keys()),
+                         list(concurrent['Common fields differences'].keys()))
+        self.assertEqual(len(serial['Common fields differences']), 6)
+        self.assertFalse(serial['Bit-reproducible'])
+        self.assertNotEqual(serial['Max normalized diff'], '{:%}'.format(0.))
+
+    def _field(self, data):
+        import epygram
+        epygram.init_env()
+        fld = epygram.fields.MiscField(fid={'test':'field'})
+        fld.setdata(data)
+        return fld
+
+    def test_chunked_normalized_comparison(self):
+        rng = numpy.random.default_rng(0)
+        ref = rng.random(10000) * 100.
+        cases = [(ref + rng.normal(0, 1e-3, ref.size), ref),  # ref is not constant
+                 (ref, numpy.zeros(ref.size)),  # ref is constant 0.
+                 (ref, numpy.full(ref.size, 3.))]  # ref is constant not 0.
+        for test, ref in cases:
+            expected, _ = self._field(test).normalized_comparison(self._field(ref))
+            for memory_budget in (0.001, 1000, None):
+                diff, common_mask = fields.chunked_normalized_comparison(test, ref, memory_budget)
+                self.assertTrue(common_mask)
+                for k in ('bias', 'std', 'errmax'):
+                    self.assertAlmostEqual(diff[k], expected[k], places=12)
+        # both constant (fails in epygram): test normalized by itself
+        diff, _ = fields.chunked_normalized_comparison(numpy.full(10, 2.), numpy.zeros(10), 0.0001)
+        self.assertEqual(diff, {'bias':1., 'std':0., 'errmax':1.})
+
+    def test_chunked_3d_comparison(self):
+        rng = numpy.random.default_rng(0)
+        shape = (15, 120, 100)  # levels of 2 chunks (cf. fields._STATS_BLOCK)
+        ref = rng.random(shape) * numpy.arange(1., 16.)[:, None, None] * 1e3
+        test = ref + rng.normal(0, 1., shape)
+        mask = numpy.zeros(shape, dtype=bool)
+        mask[:, :10, :] = True
+        for t, r in ((test, ref),
+                     (numpy.ma.masked_array(test, mask=mask), numpy.ma.masked_array(ref, mask=mask))):
+            expected, _ = self._field(t).normalized_comparison(self._field(r))
+            diff, common_mask = fields.chunked_normalized_comparison(t, r)
+            self.assertTrue(common_mask)
+            for k in ('bias', 'std', 'errmax'):
+                self.assertAlmostEqual(diff[k], expected[k], places=12)
+
+    def test_chunked_masked_data(self):
+        test = numpy.ma.masked_array(numpy.arange(100.), mask=numpy.arange(100) % 7 == 0)
+        ref = test.copy()
+        self.assertTrue(fields.data_equal(test, ref, block=8))
+        ref[3] = 1e20  # outside of epygram's mask_outside: ignored in stats
+        ref[5] = 6.
+        self.assertFalse(fields.data_equal(test, ref, block=8))
+        diff, common_mask = fields.chunked_normalized_comparison(test, ref, 0.0001)
+        # masks differ (ref[3] is outside), but as in epygram, 'Mask is common' does not invalidate
+        self.assertEqual(common_mask, self._field(test).normalized_comparison(self._field(ref))[1])
+        self.assertTrue(common_mask)
+        self.assertAlmostEqual(diff['errmax'], 1. / 98.)  # 0 is masked: ref in [1, 99]
+
+    def test_data_equal(self):
+        ref = numpy.arange(100.)
+        ref[[10, 90]] = numpy.nan
+        masked = numpy.ma.masked_array(ref, mask=numpy.arange(100) % 7 == 0)
+        for block in (8, 100, 1000):
+            self.assertTrue(fields.data_equal(ref, ref.copy(), block))  # NaN == NaN
+            self.assertTrue(fields.data_equal(ref.astype(numpy.float32), ref, block))
+            self.assertTrue(fields.data_equal(numpy.zeros(3), -numpy.zeros(3), block))
+            self.assertTrue(fields.data_equal(numpy.arange(100), numpy.arange(100.), block))
+            self.assertTrue(fields.data_equal(numpy.zeros(0), numpy.zeros(0), block))
+            self.assertFalse(fields.data_equal(ref, ref[:50], block))
+            test = ref.copy()
+            test[95] = numpy.nan
+            self.assertFalse(fields.data_equal(test, ref, block))
+            self.assertFalse(fields.data_equal(ref, test, block))
+            # masks
+            test = masked.copy()
+            test[0] = -1.  # unmasks
+            self.assertFalse(fields.data_equal(test, masked, block))
+            test = masked.copy()
+            test.data[0] = -1.  # masked value
+            self.assertTrue(fields.data_equal(test, masked, block))
+            self.assertFalse(fields.data_equal(masked, ref, block))
+            self.assertTrue(fields.data_equal(numpy.ma.masked_array(ref, mask=False), ref, block))
+        self.assertTrue(fields.data_equal(numpy.array(['a', 'b']), numpy.array(['a', 'b'])))
+
+
+class Test_caches(TestCase):
+
+    def setUp(self):
+        fd, self.listing = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            f.write(" NSTEP = 1\n  X = 2.0 \n")
+
+    def tearDown(self):
+        os.remove(self.listing)
+
+    def test_listings_cache(self):
+        cache = caches.ListingsCache()
+        lines = cache.lines(self.listing)
+        self.assertEqual(lines, [' NSTEP = 1', '  X = 2.0 '])
+        self.assertEqual(cache.stripped_lines(self.listing), ['NSTEP = 1', 'X = 2.0'])
+        self.assertIs(cache.lines(self.listing), lines)  # read only once
+        # modified file is read again
+        with open(self.listing, 'a') as f:
+            f.write("END\n")
+        os.utime(self.listing, ns=(0, 0))
+        self.assertEqual(cache.lines(self.listing)[-1], 'END')
+        self.assertEqual(len(cache), 1)
+
+    def test_workers_pools(self):
+        import pickle
+        pools = caches.WorkersPools()
+        factory = lambda: concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        with pools.executor('a', factory) as a:
+            pass
+        with pools.executor('a', factory) as executor:
+            self.assertIs(executor, a)
+        with pools.executor('b', factory) as b:
+            self.assertIsNot(b, a)
+        self.assertEqual(len(pools), 2)
+        with self.assertRaises(ValueError):
+            with pools.executor('a', factory):
+                raise ValueError()
+        self.assertEqual(len(pools), 1)  # interrupted pool is discarded
+        with self.assertRaises(RuntimeError):
+            a.submit(len, [])
+        # interrupted pool still used by another comparison: shut down by the last one
+        with pools.executor('a', factory) as a:
+            with self.assertRaises(ValueError):
+                with pools.executor('a', factory):
+                    raise ValueError()
+            self.assertEqual(a.submit(len, []).result(), 0)
+            with pools.executor('a', factory) as executor:
+                self.assertIsNot(executor, a)  # not reused
+        with self.assertRaises(RuntimeError):
+            a.submit(len, [])
+        copy = pickle.loads(pickle.dumps(pools))
+        with copy.executor('b', factory) as executor:
+            self.assertIsNot(executor, b)
+        self.assertEqual(len(copy), 0)  # copies are not persistent
+        pools.shutdown()
+        self.assertEqual(len(pools), 0)
+        with self.assertRaises(RuntimeError):
+            b.submit(len, [])
+        # pending jobs given are cancelled, whatever the Python version
+        executor = factory()
+        futures = [executor.submit(time.sleep, 0.1), executor.submit(len, [])]
+        util.shutdown_executor(executor, futures=futures)
+        self.assertTrue(futures[1].cancelled())
+
+    def test_reference_summaries(self):
+        taskinfo = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'data', 'taskinfo.expertise.continuity.json')
+        with open(taskinfo) as f:
+            full = json.load(f)
+        summaries = caches.ReferenceSummaries()
+        self.assertEqual(summaries.get(taskinfo, 'bator_profile'), full['bator_profile'])
+        self.assertIs(summaries.get(taskinfo, 'bator_profile'),
+                      summaries.get(taskinfo, 'bator_profile'))
+        self.assertRaises(KeyError, summaries.get, taskinfo, 'norms')
+
 if __name__ == '__main__':
     main(verbosity=2)
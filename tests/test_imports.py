@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) Météo France (2014-)
+# This software is governed by the CeCILL-C license under French law.
+# http://www.cecill.info
+
+from unittest import main, TestCase
+import json
+import os
+import subprocess
+import sys
+
+#: Maximum time to import what an ExpertBoard needs (measured ~0.1s), in s
+IMPORT_TIME_BUDGET = 1.
+#: Modules that must not be imported until an expert needs them
+HEAVY_MODULES = ('numpy', 'arpifs_listings', 'taylorism', 'epygram', 'matplotlib')
+
+_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+{}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{'elapsed':elapsed, 'modules':sorted(sys.modules)}}))
+"""
+
+
+def _import_in_subprocess(statements):
+    """Import in a new interpreter, returning (import time, list of imported modules)."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src')] +
+                                        [p for p in [env.get('PYTHONPATH')] if p])
+    out = subprocess.check_output([sys.executable, '-c', _SCRIPT.format(statements)], env=env)
+    out = json.loads(out)
+    return out['elapsed'], set(out['modules'])
+
+
+class Test_lazy_imports(TestCase):
+
+    def test_import_time_budget(self):
+        elapsed, modules = _import_in_subprocess('import ial_expertise.task')
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET)
+        self.assertEqual([m for m in HEAVY_MODULES if m in modules], [])
+        self.assertNotIn('ial_expertise.experts.norms', modules)
+
+    def test_load_on_demand(self):
+        _, modules = _import_in_subprocess(
+            'from ial_expertise.task import ExpertBoard\n' +
+            'ExpertBoard([dict(kind="oops:mix/test_adjoint", output="stdeo.0")])')
+        self.assertIn('ial_expertise.experts.oops', modules)
+        self.assertNotIn('ial_expertise.experts.fields', modules)
+        self.assertEqual([m for m in HEAVY_MODULES if m in modules], [])
+
+
+if __name__ == '__main__':
+    main(verbosity=2)
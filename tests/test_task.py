@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) Météo France (2014-)
+# This software is governed by the CeCILL-C license under French law.
+# http://www.cecill.info
+
+from unittest import main, TestCase
+import concurrent.futures
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from ial_expertise.experts import OutputExpert
+from ial_expertise.experts.caches import ResultsCache
+from ial_expertise.experts.util import open_summary, report_measure
+from ial_expertise import task
+from ial_expertise.task import ExpertBoard, TaskSummary, CPROFILE_ENV_VAR
+from ial_expertise.cli import expertise_batch
+
+
+class DummyExpert(OutputExpert):
+
+    _footprint = dict(
+        info = 'Dummy expert, for testing purpose.',
+        attr = dict(
+            kind = dict(
+                values = ['dummy_lead', 'dummy_side', 'dummy_slow'],
+            ),
+            duration = dict(
+                type = float,
+                optional = True,
+                default = 0.,
+            ),
+        )
+    )
+
+    #: count actual parsings/comparisons
+    calls = []
+
+    def input_files(self):
+        return []
+
+    def _parse(self):
+        self.calls.append('parse')
+        time.sleep(self.duration)
+        self.parsedOut = {'Value':len(self.kind)}
+
+    def summary(self):
+        return {'Value':self.parsedOut['Value']}
+
+    def _compare(self, references):
+        self.calls.append('compare')
+        time.sleep(self.duration)
+        report_measure('References', len(references))
+        return {'Validated means':'Same value as in reference',
+                'Validated':True,
+                'References':len(references)}
+
+
+class DummySideExpert(DummyExpert):
+
+    _footprint = dict(
+        info = 'Dummy side expert, for testing purpose.',
+        attr = dict(
+            kind = dict(
+                values = ['dummy_profiling'],
+            ),
+        )
+    )
+
+    side_expert = True
+
+
+class DummyMultiExpert(DummyExpert):
+
+    _footprint = dict(
+        info = 'Dummy expert comparing to several sets of references at once, for testing purpose.',
+        attr = dict(
+            kind = dict(
+                values = ['dummy_multi'],
+            ),
+        )
+    )
+
+    multi_reference = True
+
+    def _compare_multi(self, references):
+        self.calls.append('compare_multi')
+        return super(DummyMultiExpert, self)._compare_multi(references)
+
+
+class DummyCrashedExpert(DummyExpert):
+
+    _footprint = dict(
+        info = 'Dummy expert, whose reference was crashed, for testing purpose.',
+        attr = dict(
+            kind = dict(
+                values = ['dummy_crashed'],
+            ),
+        )
+    )
+
+    def _compare(self, references):
+        self.calls.append('compare')
+        return {'symbol':'+',
+                'short':'+ Alive again +',
+                'text':'Task Ended, whereas reference was Crashed ! (so no comparison available)'}
+
+
+class Test_TaskSummary(TestCase):
+
+    content = {'norms':{'Last step norms':{'spnorms':{'VORTICITY':1.5e-05}, 'step':'(1, 2)'},
+                        'empty':{}, 'list':[1, [], {'a':None}], 'text':'a\nb'},
+               'Status':{'symbol':'E'},
+               'empty':{}}
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_formats(self):
+        filename = os.path.join(self.tmpdir, 'task_summary.json')
+        for fmt in TaskSummary.formats:
+            summary = TaskSummary(fmt=fmt)
+            summary.update(self.content)
+            summary.dump(filename)
+            self.assertEqual(TaskSummary(filename), self.content)
+            self.assertEqual(os.listdir(self.tmpdir), ['task_summary.json'])
+            if fmt == 'indented':  # same as plain json
+                with open(filename) as f:
+                    self.assertEqual(f.read(), json.dumps(self.content, indent=2, sort_keys=True))
+        self.assertEqual(TaskSummary().dumps(), json.dumps({}, indent=2))
+
+    def test_incremental(self):
+        summary = TaskSummary()
+        summary.update(self.content)
+        summary.dumps()
+        # fragments of unchanged keys are not re-serialized
+        summary._fragments['norms'] = summary._fragments['norms'].replace('VORTICITY', 'CACHED')
+        summary['Status'] = {'symbol':'F'}
+        self.assertIn('CACHED', summary.dumps())
+        self.assertIn('"F"', summary.dumps())
+        summary.touch('norms')
+        self.assertNotIn('CACHED', summary.dumps())
+
+
+class Test_ExpertBoard(TestCase):
+
+    experts = [dict(kind='dummy_lead'),
+               dict(kind='dummy_side', duration=0.2),
+               dict(kind='dummy_slow', duration=0.1)]
+    references = [{'rh':'ref', 'ref_is':{'task':'forecast'}}]
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def _process(self, **kwargs):
+        board = ExpertBoard(self.experts, lead_expert='dummy_lead', **kwargs)
+        board.process(consistency=self.references, continuity=self.references)
+        outputs = {}
+        for which in ('consistency', 'continuity'):
+            with open_summary('task_{}.json'.format(which)) as f:
+                outputs[which] = f.read()
+        return board, outputs
+
+    def test_concurrency_is_deterministic(self):
+        _, serial = self._process()
+        board, threads = self._process(concurrency='threads', max_workers=4)
+        self.assertEqual(serial, threads)
+        self.assertEqual([e.kind for e in board.experts],
+                         ['dummy_lead', 'dummy_side', 'dummy_slow'])
+        self.assertEqual(json.loads(threads['continuity'])['comparisonStatus']['symbol'], 'OK')
+
+    def test_processes_concurrency(self):
+        import pickle
+        expert = pickle.loads(pickle.dumps(self._process()[0].experts[0]))
+        self.assertIsNone(expert.time_budget)  # unset attribute, in a copy from another process
+        _, serial = self._process(time_budget=5.)
+        board, processes = self._process(concurrency='processes', max_workers=2, time_budget=5.)
+        self.assertEqual(serial, processes)
+        self.assertEqual(json.loads(processes['continuity'])['comparisonStatus']['symbol'], 'OK')
+
+    def test_profiling(self):
+        os.environ[CPROFILE_ENV_VAR] = self.tmpdir
+        try:
+            self._process()
+        finally:
+            del os.environ[CPROFILE_ENV_VAR]
+        with open('task_summary.json') as f:
+            profiling = json.load(f)['_Expertise profiling']
+        self.assertEqual(sorted(profiling['dummy_side'].keys()),
+                         ['compare (consistency)', 'compare (continuity)', 'parse'])
+        self.assertGreaterEqual(profiling['dummy_side']['parse']['Wall time (s)'], 0.2)
+        self.assertTrue(os.path.exists('expertise_cprofile.dummy_side.compare_continuity.prof'))
+        # measures reported by experts, by step even if concurrent
+        for concurrency in (None, 'threads', 'processes'):
+            board, _ = self._process(concurrency=concurrency, max_workers=4)
+            for step in ('compare (consistency)', 'compare (continuity)'):
+                self.assertEqual(board.profiling['dummy_side'][step]['References'], [1])
+            self.assertNotIn('References', board.profiling['dummy_side']['parse'])
+
+    def test_results_cache(self):
+        with open('reference', 'w') as f:
+            f.write('0')
+        reference = type('ResourceHandler', (), {})()
+        reference.container = type('Container', (), {'localpath':lambda self: 'reference'})()
+        self.references = [{'rh':reference, 'ref_is':{'task':'forecast'}}]
+        cache = ResultsCache(os.path.join(self.tmpdir, 'cache'), fingerprint='content')
+        DummyExpert.calls[:] = []
+        _, first = self._process(results_cache=cache)
+        self.assertEqual(DummyExpert.calls.count('parse'), 3)
+        # same references in consistency and continuity: compared once
+        self.assertEqual(DummyExpert.calls.count('compare'), 3)
+        DummyExpert.calls[:] = []
+        _, second = self._process(results_cache=cache)
+        self.assertEqual(DummyExpert.calls, [])
+        self.assertEqual(first, second)
+        # reference has changed: delayed parsing is needed to compare again
+        with open('reference', 'w') as f:
+            f.write('1')
+        self._process(results_cache=cache)
+        self.assertEqual(DummyExpert.calls.count('parse'), 3)
+        self.assertEqual(DummyExpert.calls.count('compare'), 3)
+
+    def test_time_budget(self):
+        self.experts = [dict(kind='dummy_lead'),
+                        dict(kind='dummy_side', duration=1.),
+                        dict(kind='dummy_slow', duration=0.1)]
+        for concurrency in (None, 'threads'):
+            t0 = time.time()
+            board, outputs = self._process(concurrency=concurrency, time_budget=0.5)
+            self.assertLess(time.time() - t0, 1.)
+            self.assertEqual(board.task_summary['dummy_side']['Parsing'], 'Timeout')
+            self.assertEqual(board.task_summary['dummy_slow'], {'Value':10})
+            continuity = json.loads(outputs['continuity'])
+            self.assertEqual(continuity['dummy_side']['Comparison'], 'Timeout')
+            self.assertTrue(continuity['dummy_slow']['Validated'])
+            self.assertEqual(continuity['comparisonStatus']['symbol'], 'T')
+        # budget that cannot be enforced (out of the main thread): told
+        with self.assertLogs('ial_expertise.task', 'WARNING'):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                self.assertEqual(executor.submit(task._time_limited, 0.5, len, []).result(), 0)
+        # expert's own budget prevails
+        self.experts[1]['time_budget'] = 5.
+        board, _ = self._process(time_budget=0.5)
+        self.assertEqual(board.task_summary['dummy_side'], {'Value':10})
+
+    def test_reference_crashed(self):
+        # the provisional status stated after the first expert must not hide the crash
+        self.experts = [dict(kind='dummy_crashed'), dict(kind='dummy_lead'), dict(kind='dummy_slow')]
+        for concurrency in (None, 'threads'):
+            board, outputs = self._process(concurrency=concurrency)
+            continuity = json.loads(outputs['continuity'])
+            self.assertEqual(continuity['comparisonStatus']['symbol'], '+')
+            self.assertEqual(sorted(continuity.keys()), ['comparisonStatus', 'leadExpert'])
+
+    def test_summary_format(self):
+        _, outputs = self._process()
+        _, compressed = self._process(summary_format='gzip')
+        for which in ('consistency', 'continuity'):
+            self.assertEqual(TaskSummary('task_{}.json'.format(which)), json.loads(outputs[which]))
+            self.assertEqual(json.loads(compressed[which]), json.loads(outputs[which]))
+
+    def test_workers_pools(self):
+        board, _ = self._process()
+        self.assertEqual(set([id(e.workers_pools) for e in board.experts]), set([id(board.workers_pools)]))
+        self.assertEqual(len(board.workers_pools), 0)  # shut down
+
+    def test_multi_reference(self):
+        _, outputs = self._process()
+        self.experts = [dict(kind='dummy_lead'), dict(kind='dummy_multi', duration=0.1)]
+        for concurrency in (None, 'threads'):
+            DummyExpert.calls[:] = []
+            board, multi = self._process(concurrency=concurrency)
+            self.assertEqual(DummyExpert.calls.count('compare_multi'), 1)
+            self.assertEqual(DummyExpert.calls.count('compare'), 2 + 2)
+            self.assertEqual(sorted(board.profiling['dummy_multi'].keys()),
+                             ['compare (consistency, continuity)', 'parse'])
+            for which in ('consistency', 'continuity'):
+                self.assertEqual(json.loads(multi[which])['dummy_multi'],
+                                 json.loads(outputs[which])['dummy_side'])
+
+    def test_fast_verdict(self):
+        self.experts = self.experts + [dict(kind='dummy_profiling', duration=0.2)]
+        _, outputs = self._process()
+        _, after = self._process(fast_verdict='after')
+        self.assertEqual(outputs, after)
+        board, skip = self._process(fast_verdict='skip')
+        self.assertNotIn('dummy_profiling', board.task_summary)
+        self.assertNotIn('dummy_profiling', json.loads(skip['continuity']))
+        self.assertEqual(json.loads(skip['continuity'])['comparisonStatus'],
+                         json.loads(outputs['continuity'])['comparisonStatus'])
+        board, background = self._process(fast_verdict='background')
+        self.assertNotIn('dummy_profiling', json.loads(background['continuity']))
+        board.wait()
+        with open('task_continuity.json') as f:
+            self.assertEqual(f.read(), outputs['continuity'])
+        # side experts in background cannot be interrupted, but are abandoned if late
+        self.experts[-1]['duration'] = 2.
+        board, _ = self._process(fast_verdict='background', time_budget=0.5)
+        t0 = time.time()
+        board.wait()
+        self.assertLess(time.time() - t0, 1.)
+        self.assertEqual(board.task_summary['dummy_profiling']['Parsing'], 'Timeout')
+
+
+class Test_expertise_batch(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for task, heavy in (('a', True), ('b', True), ('c/d', False)):
+            taskdir = os.path.join(self.tmpdir, task)
+            os.makedirs(taskdir)
+            with open(os.path.join(taskdir, 'reference'), 'w') as f:
+                f.write('0')
+            config = {'experts':[dict(kind='dummy_lead'), dict(kind='dummy_side')],
+                      'lead_expert':'dummy_lead',
+                      'heavy':heavy,
+                      'continuity':[{'kind':'taskinfo', 'path':'reference', 'task':'forecast'}]}
+            with open(os.path.join(taskdir, expertise_batch.CONFIG_NAME), 'w') as f:
+                json.dump(config, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_run_tasks(self):
+        tasks = expertise_batch.find_tasks(self.tmpdir)
+        self.assertEqual([os.path.relpath(t, self.tmpdir) for t in tasks], ['a', 'b', 'c/d'])
+        for workers in (0, 2):
+            results = expertise_batch.run_tasks(tasks, workers=workers, max_heavy=1, progress=None)
+            self.assertEqual([r[0] for r in results], tasks)
+            self.assertEqual([r[2] for r in results], [None] * 3)
+            self.assertEqual([r[1]['continuity'] for r in results], ['OK'] * 3)
+            for t in tasks:
+                self.assertTrue(os.path.exists(os.path.join(t, 'task_continuity.json')))
+
+    def test_bad_config(self):
+        tasks = expertise_batch.find_tasks(self.tmpdir)
+        with open(os.path.join(tasks[0], expertise_batch.CONFIG_NAME), 'w') as f:
+            f.write('{"experts": [')
+        for workers in (0, 2):
+            results = expertise_batch.run_tasks(tasks, workers=workers, progress=None)
+            self.assertEqual([r[0] for r in results], tasks)
+            self.assertTrue(results[0][2].startswith('JSONDecodeError: '))
+            self.assertEqual(results[0][1], {})
+            self.assertEqual([r[1]['continuity'] for r in results[1:]], ['OK'] * 2)
+
+
+if __name__ == '__main__':
+    main(verbosity=2)